@@ -1,4 +1,5 @@
 import streamlit as st
+import html
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -14,7 +15,8 @@ st.set_page_config(
 )
 
 # Import custom modules
-from utils.database import init_database, verify_user, create_user
+from utils.database import init_database, create_user
+from utils.auth import authenticate_user, get_client_ip, start_session, restore_session, end_session
 
 def main():
     """Main application entry point for EchoPrep AI interview platform"""
@@ -495,11 +497,8 @@ def main():
     </style>
     """, unsafe_allow_html=True)
     
-    # Check if user is logged in
-    if "logged_in" not in st.session_state:
-        st.session_state.logged_in = False
-    
-    if st.session_state.logged_in:
+    # Check if user is logged in (restores the session from its token after reloads)
+    if restore_session():
         show_dashboard()
     else:
         show_login_page()
@@ -543,15 +542,13 @@ def show_login_page():
             
             if submit_signin:
                 if username and password:
-                    user_data = verify_user(username, password)
+                    user_data, error_message = authenticate_user(username, password, get_client_ip())
                     if user_data:
-                        st.session_state.logged_in = True
-                        st.session_state.user_id = user_data['id']
-                        st.session_state.username = user_data['username']
+                        start_session(user_data)
                         st.success("✅ Login successful!")
                         st.rerun()
                     else:
-                        st.error("❌ Invalid username or password")
+                        st.error(f"❌ {error_message}")
                 else:
                     st.warning("⚠️ Please fill in all fields")
     
@@ -678,12 +675,76 @@ def show_dashboard():
     
     with col4:
         if st.button("🚪 Sign Out", use_container_width=True):
+            end_session()
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
     
     st.markdown('</div>', unsafe_allow_html=True)
     
+    # Progress section, read from the precomputed per-user summary
+    from utils.database import get_user_progress, get_user_score_history
+    progress = get_user_progress(st.session_state.user_id)
+    if progress:
+        st.markdown('<h2 class="section-header">📈 Your Progress</h2>', unsafe_allow_html=True)
+        
+        col1, col2, col3, col4 = st.columns([1, 1, 1, 1], gap="medium")
+        col1.metric("Interviews Analyzed", progress['interview_count'])
+        col2.metric("Average Score", f"{progress['average_score']:.0f}%")
+        col3.metric(
+            "Recent Trend",
+            f"{progress['rolling_average']:.0f}%",
+            delta=f"{progress['rolling_average'] - progress['average_score']:+.1f}"
+        )
+        col4.metric("Best Score", f"{progress['best_score']}%")
+        
+        history = get_user_score_history(st.session_state.user_id)
+        if len(history) > 1:
+            st.markdown("**Score per interview**")
+            st.line_chart(
+                {"Overall Score": [entry['overall_score'] for entry in history]},
+                x_label="Interview",
+                y_label="Score"
+            )
+        
+        if progress['dimensions']:
+            st.bar_chart({
+                dimension.replace('_', ' ').title(): round(values['average_score'], 1)
+                for dimension, values in progress['dimensions'].items()
+            })
+    
+    # Search section over past answers and feedback (SQLite FTS5)
+    st.markdown('<h2 class="section-header">🔎 Search Your Answers</h2>', unsafe_allow_html=True)
+    search_text = st.text_input(
+        "Search your answers",
+        placeholder="e.g. Kafka, conflict with a teammate, query optimization",
+        key="answer_search",
+        label_visibility="collapsed"
+    )
+    if search_text.strip():
+        from utils.database import search_user_answers, SEARCH_MATCH_START, SEARCH_MATCH_END
+        results = search_user_answers(st.session_state.user_id, search_text)
+        
+        if results:
+            for index, result in enumerate(results):
+                snippet = html.escape(result['snippet'] or '').replace(SEARCH_MATCH_START, '<mark>').replace(SEARCH_MATCH_END, '</mark>')
+                title = html.escape(result['question']) if result['kind'] == 'response' else 'Overall feedback'
+                st.markdown(f"""
+                <div class="interview-card">
+                    <p style="margin: 0 0 0.4rem 0; color: #2c3e50; font-size: 0.95rem; font-weight: 600;">{title}</p>
+                    <p style="margin: 0.2rem 0; color: #34495e; font-size: 0.9rem;">{snippet}</p>
+                    <p style="margin: 0; color: #7f8c8d; font-size: 0.8rem;">🎯 {html.escape(result['job_role'] or '')} - {html.escape(result['experience_level'] or '')} · {result['created_at']}</p>
+                </div>
+                """, unsafe_allow_html=True)
+                
+                col1, col2 = st.columns([3, 1])
+                with col2:
+                    if st.button("📊 Report", key=f"search_report_{index}_{result['interview_id']}", use_container_width=True):
+                        st.session_state.current_interview_id = result['interview_id']
+                        st.switch_page("pages/report.py")
+        else:
+            st.info("No answers match your search.")
+    
     # Recent activity section
     st.markdown('<h2 class="section-header">📚 Recent Activity</h2>', unsafe_allow_html=True)
     
@@ -704,7 +765,7 @@ def show_dashboard():
                     <p style="margin: 0.2rem 0; color: #34495e; font-size: 0.9rem;"><strong>Type:</strong> {interview.get('interview_type', 'N/A')}</p>
                     <p style="margin: 0.2rem 0; color: #34495e; font-size: 0.9rem;"><strong>Skills:</strong> {interview.get('skills', 'N/A')}</p>
                     <p style="margin: 0.6rem 0; color: {'#6D94C5' if interview.get('completed', False) else '#E8DFCA'}; font-size: 0.9rem; font-weight: 500;">
-                        {'✅ Completed' if interview.get('completed', False) else '⏳ In Progress'}
+                        {'✅ Completed' if interview.get('completed', False) else '⏳ In Progress'}{f" · Score: {interview['overall_score']}%" if interview.get('overall_score') is not None else ''}
                     </p>
                     <p style="margin: 0; color: #7f8c8d; font-size: 0.8rem;"><strong>Created:</strong> {interview.get('created_at', 'Unknown')}</p>
                 </div>
@@ -1,17 +1,19 @@
 import streamlit as st
-import json
 import time
-from utils.auth import get_current_user_id
-from utils.database import get_interview_mock, create_interview_session
-from utils.audio_utils import text_to_speech, create_audio_player, get_audio_recorder, speech_to_text_local
-from utils.ai_services import analyze_interview_performance
+from collections import OrderedDict
+from utils.auth import require_authentication
+from utils.session_cache import get_cached_interview
+from utils.audio_utils import (
+    create_audio_player, get_audio_recorder, speech_to_text_local, prefetch_speech, get_prefetched_speech,
+    is_speech_ready, play_speech_stream
+)
+from utils.audio_archive import archive_recording, recording_digest
+from utils.speech_metrics import analyze_transcript
+from utils.audio_jobs import AudioJobError, measure_delivery, pcm_payload, preprocess_recording, run_audio_job
+from utils.completion_jobs import submit_interview_completion
 
 # Check authentication
-if 'authenticated' not in st.session_state or not st.session_state.authenticated:
-    st.error("Please login to access this page")
-    if st.button("← Back to Login"):
-        st.switch_page("main.py")
-    st.stop()
+require_authentication()
 
 st.set_page_config(
     page_title="Interview in Progress - EchoPrep",
@@ -211,8 +213,181 @@ header {visibility: hidden;}
 </style>
 """, unsafe_allow_html=True)
 
+def get_recording_preview(question_index, audio):
+    """Exported WAV bytes for the current recording, encoded once per recording
+    
+    Keyed by question and a digest of the raw samples, so reruns reuse the same bytes
+    (and the same media URL) instead of re-encoding and resending the audio. The export
+    runs in an audio worker process; data is None when that was not possible right now.
+    """
+    digest = recording_digest(audio)
+    preview = st.session_state.get('recording_preview')
+    if not preview or preview['question'] != question_index or preview['digest'] != digest or preview['data'] is None:
+        try:
+            data = run_audio_job(preprocess_recording, pcm_payload(audio))
+        except AudioJobError as e:
+            print(f"Recording preview unavailable: {e}")
+            data = None
+        preview = {'question': question_index, 'digest': digest, 'data': data, 'audio': audio}
+        st.session_state.recording_preview = preview
+    return preview
+
+def measure_answer_delivery(audio, response):
+    """Pace, pause and filler metrics for an answer; text-only metrics when nothing was recorded"""
+    try:
+        if audio is not None:
+            return run_audio_job(measure_delivery, pcm_payload(audio), response)
+    except Exception as e:
+        print(f"Speech analysis failed: {e}")
+    return analyze_transcript(response)
+
+def load_interview(interview_id):
+    """Interview row and parsed questions, from the session's read-through cache"""
+    interview_data, questions = get_cached_interview(interview_id)
+    session = st.session_state.get('interview_session')
+    if questions and not (session and session['interview_data']['id'] == interview_id):
+        st.session_state.interview_session = {
+            'current_question': 0,
+            'responses': [],
+            'start_time': time.time(),
+            'interview_data': interview_data
+        }
+    return interview_data, questions
+
+@st.fragment
+def show_question_panel(current_q, questions):
+    """Current question and its text-to-speech; listening reruns only this panel"""
+    question = questions[current_q]
+    
+    # Display current question
+    st.markdown(f"""
+    <div class="question-section">
+        <div class="question-text">
+            <strong>Question {current_q + 1}:</strong><br>
+            {question}
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Text-to-speech for question; this question and the next one are synthesized in the
+    # background while the candidate reads and answers
+    tts_cache = st.session_state.setdefault('tts_prefetch', OrderedDict())
+    prefetch_speech(tts_cache, question)
+    if current_q + 1 < len(questions):
+        prefetch_speech(tts_cache, questions[current_q + 1])
+    
+    col_audio1, col_audio2 = st.columns([1, 3])
+    with col_audio1:
+        if st.button("🔊 Listen to Question", key=f"listen_q_{current_q}"):
+            if is_speech_ready(tts_cache, question):
+                audio_html = create_audio_player(get_prefetched_speech(tts_cache, question), autoplay=True)
+                st.markdown(audio_html, unsafe_allow_html=True)
+            else:
+                # Not prefetched yet: start playing the first sentence while the rest is synthesized
+                with st.spinner("Generating audio..."):
+                    if not play_speech_stream(question):
+                        st.error("Could not generate audio for this question.")
+
+@st.fragment
+def show_recorder(current_q):
+    """Voice recorder with a memoized preview; recording reruns only this panel"""
+    st.markdown("### 🎤 Voice Response")
+    st.markdown("Record your answer using the microphone:")
+    
+    try:
+        audio = get_audio_recorder(key=f"recorder_{current_q}")
+        
+        if len(audio) > 0:
+            recording = get_recording_preview(current_q, audio)
+            if recording['data']:
+                st.audio(recording['data'], format="audio/wav")
+            else:
+                st.caption("⏳ The preview is not available right now; your recording is kept.")
+            
+            if st.button("📝 Convert Speech to Text", key=f"convert_{current_q}"):
+                with st.spinner("Converting speech to text..."):
+                    transcribed_text = speech_to_text_local(audio)
+                    st.session_state[f'transcribed_response_{current_q}'] = transcribed_text
+                    st.success("Speech converted to text!")
+                    # The transcription pre-fills the response box, so the whole page reruns
+                    st.rerun()
+        elif st.session_state.get('recording_preview', {}).get('question') == current_q:
+            del st.session_state['recording_preview']
+    
+    except Exception as e:
+        print(f"Voice recording unavailable: {e}")
+        st.info("Voice recording not available. Please use the text input below.")
+
+@st.fragment
+def show_response_box(current_q, question):
+    """Text answer and navigation; typing reruns only this panel"""
+    st.markdown("### ✍️ Text Response")
+    
+    # Show transcribed text if available
+    initial_value = ""
+    if f'transcribed_response_{current_q}' in st.session_state:
+        initial_value = st.session_state[f'transcribed_response_{current_q}']
+        st.info(f"Transcribed from voice: {initial_value}")
+    
+    response = st.text_area(
+        "Type your answer here:",
+        value=initial_value,
+        placeholder="Share your thoughts and experience...",
+        height=150,
+        key=f"response_{current_q}"
+    )
+    
+    # Navigation buttons
+    col_nav1, col_nav2, col_nav3 = st.columns([1, 1, 1])
+    
+    with col_nav2:
+        if st.button("Next Question ➡️", key=f"next_{current_q}", type="primary"):
+            if response.strip():
+                # Save response, archiving the recorded answer (if any) as compact Opus
+                recording = st.session_state.get('recording_preview')
+                if recording and recording['question'] != current_q:
+                    recording = None
+                audio = recording['audio'] if recording else None
+                
+                st.session_state.interview_session['responses'].append({
+                    'question': question,
+                    'response': response,
+                    'timestamp': time.time(),
+                    'audio_digest': archive_recording(audio, recording['digest'] if recording else None),
+                    'speech_metrics': measure_answer_delivery(audio, response)
+                })
+                
+                # Move to next question
+                st.session_state.interview_session['current_question'] += 1
+                
+                # Clear transcribed response and the previous recording's preview
+                for key in [f'transcribed_response_{current_q}', 'recording_preview']:
+                    if key in st.session_state:
+                        del st.session_state[key]
+                
+                st.rerun()
+            else:
+                st.error("Please provide a response before proceeding.")
+
+@st.fragment(run_every=1)
+def show_timer():
+    """Elapsed time, refreshed every second without rerunning the page"""
+    elapsed_time = time.time() - st.session_state.interview_session['start_time']
+    minutes = int(elapsed_time // 60)
+    seconds = int(elapsed_time % 60)
+    
+    st.markdown(f"""
+    <div class="timer-display">
+        ⏱️ Time Elapsed: {minutes:02d}:{seconds:02d}
+    </div>
+    """, unsafe_allow_html=True)
+
 def main():
-    """Main interview function with voice functionality"""
+    """Main interview function with voice functionality
+    
+    The question panel, recorder, response box and timer are fragments, so interacting
+    with one of them reruns only that region.
+    """
     
     # Check if interview ID is provided
     if 'current_interview_id' not in st.session_state:
@@ -221,31 +396,20 @@ def main():
             st.switch_page("main.py")
         st.stop()
     
-    # Get interview data
-    interview_data = get_interview_mock(st.session_state.current_interview_id)
+    # Get interview data and parsed questions
+    interview_data, questions = load_interview(st.session_state.current_interview_id)
     if not interview_data:
         st.error("Interview not found.")
         if st.button("← Back to Dashboard"):
             st.switch_page("main.py")
         st.stop()
     
-    # Parse questions
-    questions = json.loads(interview_data.get('questions', '[]'))
     if not questions:
         st.error("No questions found for this interview.")
         if st.button("← Back to Dashboard"):
             st.switch_page("main.py")
         st.stop()
     
-    # Initialize session state
-    if 'interview_session' not in st.session_state:
-        st.session_state.interview_session = {
-            'current_question': 0,
-            'responses': [],
-            'start_time': time.time(),
-            'interview_data': interview_data
-        }
-    
     # Header
     st.markdown("""
     <div class="main-container">
@@ -266,10 +430,10 @@ def main():
     total_questions = len(questions)
     
     # Progress indicator
-    progress = (current_q + 1) / total_questions
+    progress = min(current_q + 1, total_questions) / total_questions
     st.markdown(f"""
     <div class="progress-container">
-        <div class="question-counter">Question {current_q + 1} of {total_questions}</div>
+        <div class="question-counter">Question {min(current_q + 1, total_questions)} of {total_questions}</div>
         <div class="progress-bar-bg">
             <div class="progress-bar" style="width: {progress * 100}%"></div>
         </div>
@@ -277,107 +441,15 @@ def main():
     """, unsafe_allow_html=True)
     
     if current_q < total_questions:
-        question = questions[current_q]
-        
-        # Display current question
-        st.markdown(f"""
-        <div class="question-section">
-            <div class="question-text">
-                <strong>Question {current_q + 1}:</strong><br>
-                {question}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Text-to-speech for question
-        col_audio1, col_audio2 = st.columns([1, 3])
-        with col_audio1:
-            if st.button("🔊 Listen to Question", key=f"listen_q_{current_q}"):
-                with st.spinner("Generating audio..."):
-                    audio_data = text_to_speech(question)
-                    if audio_data:
-                        audio_html = create_audio_player(audio_data, autoplay=True)
-                        st.markdown(audio_html, unsafe_allow_html=True)
-                    else:
-                        st.error("Could not generate audio for this question.")
+        show_question_panel(current_q, questions)
         
         # Response section
         st.markdown('<div class="response-section">', unsafe_allow_html=True)
-        
-        # Voice response option
-        st.markdown("### 🎤 Voice Response")
-        st.markdown("Record your answer using the microphone:")
-        
-        # Import and use audio recorder
-        try:
-            audio = get_audio_recorder()
-            
-            if len(audio) > 0:
-                st.audio(audio.export().read())
-                
-                if st.button("📝 Convert Speech to Text", key=f"convert_{current_q}"):
-                    with st.spinner("Converting speech to text..."):
-                        transcribed_text = speech_to_text_local(audio)
-                        st.session_state[f'transcribed_response_{current_q}'] = transcribed_text
-                        st.success("Speech converted to text!")
-                        st.rerun()
-        
-        except Exception as e:
-            st.info("Voice recording not available. Please use the text input below.")
-        
-        # Text response option
-        st.markdown("### ✍️ Text Response")
-        
-        # Show transcribed text if available
-        initial_value = ""
-        if f'transcribed_response_{current_q}' in st.session_state:
-            initial_value = st.session_state[f'transcribed_response_{current_q}']
-            st.info(f"Transcribed from voice: {initial_value}")
-        
-        response = st.text_area(
-            "Type your answer here:",
-            value=initial_value,
-            placeholder="Share your thoughts and experience...",
-            height=150,
-            key=f"response_{current_q}"
-        )
-        
+        show_recorder(current_q)
+        show_response_box(current_q, questions[current_q])
         st.markdown('</div>', unsafe_allow_html=True)
         
-        # Navigation buttons
-        col_nav1, col_nav2, col_nav3 = st.columns([1, 1, 1])
-        
-        with col_nav2:
-            if st.button("Next Question ➡️", key=f"next_{current_q}", type="primary"):
-                if response.strip():
-                    # Save response
-                    st.session_state.interview_session['responses'].append({
-                        'question': question,
-                        'response': response,
-                        'timestamp': time.time()
-                    })
-                    
-                    # Move to next question
-                    st.session_state.interview_session['current_question'] += 1
-                    
-                    # Clear transcribed response
-                    if f'transcribed_response_{current_q}' in st.session_state:
-                        del st.session_state[f'transcribed_response_{current_q}']
-                    
-                    st.rerun()
-                else:
-                    st.error("Please provide a response before proceeding.")
-        
-        # Show timer
-        elapsed_time = time.time() - st.session_state.interview_session['start_time']
-        minutes = int(elapsed_time // 60)
-        seconds = int(elapsed_time % 60)
-        
-        st.markdown(f"""
-        <div class="timer-display">
-            ⏱️ Time Elapsed: {minutes:02d}:{seconds:02d}
-        </div>
-        """, unsafe_allow_html=True)
+        show_timer()
     
     else:
         # Interview completed
@@ -392,16 +464,17 @@ def main():
         
         with col_final1:
             if st.button("📊 View Report", type="primary", use_container_width=True):
-                # Save final interview session
-                try:
-                    from utils.database import complete_interview_with_responses
-                    complete_interview_with_responses(
+                # Answers are saved and analyzed in the background; the report shows the progress
+                session = st.session_state.interview_session
+                if not session.get('completion_job'):
+                    session['completion_job'] = submit_interview_completion(
                         st.session_state.current_interview_id,
-                        st.session_state.interview_session['responses']
+                        session['responses']
                     )
-                except:
-                    pass  # Handle if function doesn't exist
-                st.switch_page("pages/report.py")
+                if session['completion_job']:
+                    st.switch_page("pages/report.py")
+                else:
+                    st.error("❌ Could not save your answers for analysis. Please try again.")
         
         with col_final3:
             if st.button("🏠 Back to Dashboard", use_container_width=True):
@@ -2,9 +2,16 @@ import streamlit as st
 import json
 import time
 from utils.auth import get_current_user_id
-from utils.database import get_interview_mock, create_interview_session
-from utils.audio_utils import text_to_speech, create_audio_player
-from utils.ai_services import analyze_interview_performance
+from utils.database import get_interview_mock
+from utils.audio_utils import text_to_speech, create_audio_player, play_audio_streamlit, process_audio_file, estimate_audio_seconds
+from utils.completion_jobs import submit_interview_completion
+
+# Timed UI transitions run as fragments that re-check a deadline, so no script thread sleeps
+STATUS_REFRESH_SECONDS = 0.5
+# Browser playback starts after the audio has been sent and autoplay kicks in; the status
+# keeps saying "speaking" for this much longer than the audio itself
+PLAYBACK_START_SLACK_SECONDS = 3
+REDIRECT_DELAY_SECONDS = 2
 
 # Check authentication
 if 'authenticated' not in st.session_state or not st.session_state.authenticated:
@@ -236,104 +243,6 @@ st.markdown("""
 footer {visibility: hidden;}
 header {visibility: hidden;}
 </style>
-""", unsafe_allow_html=True)
-        border-radius: 15px;
-        text-align: center;
-        font-weight: 600;
-        margin: 20px 0;
-        animation: pulse 2s infinite;
-        box-shadow: 0 8px 25px rgba(229, 62, 62, 0.3);
-    }
-    
-    @keyframes pulse {
-        0% { opacity: 1; }
-        50% { opacity: 0.7; }
-        100% { opacity: 1; }
-    }
-    
-    .controls-section {
-        display: flex;
-        gap: 15px;
-        justify-content: center;
-        flex-wrap: wrap;
-        margin: 30px 0;
-    }
-    
-    [data-testid="stButton"] > button {
-        background: linear-gradient(135deg, #647FBC, #91ADC8);
-        color: white;
-        border: none;
-        border-radius: 15px;
-        padding: 15px 30px;
-        font-weight: 600;
-        font-size: 1.1rem;
-        font-family: 'Crimson Text', serif;
-        transition: all 0.3s ease;
-        box-shadow: 0 8px 25px rgba(100, 127, 188, 0.3);
-        min-width: 150px;
-    }
-    
-    [data-testid="stButton"] > button:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 12px 35px rgba(100, 127, 188, 0.4);
-    }
-    
-    .record-button {
-        background: linear-gradient(135deg, #e53e3e, #c53030) !important;
-        box-shadow: 0 8px 25px rgba(229, 62, 62, 0.3) !important;
-    }
-    
-    .record-button:hover {
-        box-shadow: 0 12px 35px rgba(229, 62, 62, 0.4) !important;
-    }
-    
-    .success-button {
-        background: linear-gradient(135deg, #48bb78, #38a169) !important;
-        box-shadow: 0 8px 25px rgba(72, 187, 120, 0.3) !important;
-    }
-    
-    .success-button:hover {
-        box-shadow: 0 12px 35px rgba(72, 187, 120, 0.4) !important;
-    }
-    
-    [data-testid="stTextArea"] > div > div > textarea {
-        border-radius: 15px;
-        border: 2px solid #AED6CF;
-        padding: 20px;
-        font-family: 'Crimson Text', serif;
-        font-size: 1.1rem;
-        min-height: 150px;
-        transition: all 0.3s ease;
-    }
-    
-    [data-testid="stTextArea"] > div > div > textarea:focus {
-        border-color: #647FBC;
-        box-shadow: 0 0 0 3px rgba(100, 127, 188, 0.1);
-    }
-    
-    .completion-card {
-        background: linear-gradient(135deg, #91ADC8, #AED6CF);
-        color: white;
-        padding: 40px;
-        border-radius: 20px;
-        text-align: center;
-        margin: 30px 0;
-        box-shadow: 0 15px 40px rgba(145, 173, 200, 0.3);
-    }
-    
-    .completion-title {
-        font-family: 'Playfair Display', serif;
-        font-size: 2rem;
-        font-weight: 800;
-        margin-bottom: 15px;
-    }
-    
-    .completion-text {
-        font-family: 'Crimson Text', serif;
-        font-size: 1.2rem;
-        opacity: 0.9;
-    }
-    </style>
 """, unsafe_allow_html=True)
 
 # Custom CSS
@@ -487,20 +396,37 @@ def main():
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-def show_current_question():
-    """Display current question and handle response"""
-    
-    current_question = st.session_state.questions[st.session_state.current_question_index]
-    
-    # Status indicator
-    status_class = st.session_state.interview_status
+def show_status_indicator():
+    """Interviewer status: speaking while the question audio plays, then listening"""
+    speaking = time.time() < st.session_state.get('speaking_until', 0)
+    status_class = "speaking" if speaking else st.session_state.interview_status
     status_text = {
         "speaking": "🔊 AI is asking a question...",
         "listening": "🎤 Your turn to respond",
         "waiting": "⏳ Processing..."
     }
     
-    st.markdown(f'<div class="status-indicator {status_class}">{status_text[st.session_state.interview_status]}</div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="status-indicator {status_class}">{status_text[status_class]}</div>', unsafe_allow_html=True)
+
+def refresh_status_while_speaking():
+    """Timed status fragment; once speaking ends, one full rerun renders the static status and stops the timer"""
+    if time.time() >= st.session_state.get('speaking_until', 0):
+        st.rerun(scope="app")
+    show_status_indicator()
+
+def redirect_when_due(page, redirect_at):
+    """Switch page once redirect_at has passed; run as a timed fragment instead of sleeping"""
+    if time.time() >= redirect_at:
+        st.session_state.pop('redirect_at', None)
+        st.switch_page(page)
+
+def show_current_question():
+    """Display current question and handle response"""
+    
+    current_question = st.session_state.questions[st.session_state.current_question_index]
+    
+    # Status indicator; it flips to "listening" on its own once the question audio has played
+    status_placeholder = st.container()
     
     # Question display
     st.markdown('<div class="question-box">', unsafe_allow_html=True)
@@ -508,20 +434,31 @@ def show_current_question():
     st.write(f"**{current_question}**")
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Audio playback for question
+    # Audio playback for question; the response section is shown right away instead of
+    # holding the script thread until playback ends
+    audio_slot = st.container()
     if st.session_state.interview_status == "speaking":
+        st.session_state.speaking_until = time.time()
+        st.session_state.pop('question_audio', None)
         with st.spinner("Generating audio..."):
             audio_data = text_to_speech(current_question)
             if audio_data:
-                play_audio_streamlit(audio_data, autoplay=True)
-        
-        # Automatically switch to listening after a delay
-        time.sleep(2)
+                st.session_state.question_audio = audio_data
+                st.session_state.speaking_until = time.time() + estimate_audio_seconds(audio_data) + PLAYBACK_START_SLACK_SECONDS
         st.session_state.interview_status = "listening"
-        st.rerun()
+    
+    # Rendered unchanged on every run until the next question, so reruns never cut playback short
+    with audio_slot:
+        play_audio_streamlit(st.session_state.get('question_audio'), autoplay=True)
+    
+    with status_placeholder:
+        if time.time() < st.session_state.get('speaking_until', 0):
+            st.fragment(run_every=STATUS_REFRESH_SECONDS)(refresh_status_while_speaking)()
+        else:
+            show_status_indicator()
     
     # Response input section
-    elif st.session_state.interview_status == "listening":
+    if st.session_state.interview_status == "listening":
         st.markdown("### Your Response")
         
         col1, col2 = st.columns([2, 1])
@@ -607,46 +544,30 @@ def finalize_interview():
     
     if st.session_state.interview_transcript:
         
-        # Generate transcript text
-        transcript_text = ""
-        for entry in st.session_state.interview_transcript:
-            transcript_text += f"Q: {entry['question']}\\n"
-            transcript_text += f"A: {entry['response']}\\n\\n"
-        
-        # Get interview details
-        interview = get_interview_mock(st.session_state.current_interview_id)
-        
-        with st.spinner("Analyzing your performance..."):
-            # Generate AI feedback
-            analysis = analyze_interview_performance(
-                transcript=transcript_text,
-                job_role=interview['job_role'],
-                experience_level=interview['experience_level'],
-                skills=interview['skills']
-            )
-            
-            # Save session to database
-            session_id = create_interview_session(
-                mock_id=st.session_state.current_interview_id,
-                transcript=transcript_text,
-                feedback=json.dumps(analysis),
-                score=analysis.get('overall_score', 0)
-            )
-        
-        st.success("Analysis complete! Redirecting to your feedback report...")
+        # Answers are saved and analyzed in the background; the report shows the progress
+        job_id = submit_interview_completion(
+            st.session_state.current_interview_id,
+            st.session_state.interview_transcript
+        )
+        if job_id is None:
+            # Keep the answers so the next attempt can queue them again
+            st.error("❌ Could not save your answers for analysis. Please try again.")
+            if st.button("🔄 Try Again", key="retry_completion_btn"):
+                st.rerun()
+            return
         
         # Clear interview state
-        for key in ['interview_started', 'current_question_index', 'interview_transcript', 'questions', 'interview_status']:
+        for key in ['interview_started', 'current_question_index', 'interview_transcript', 'questions', 'interview_status', 'speaking_until', 'question_audio']:
             if key in st.session_state:
                 del st.session_state[key]
         
-        time.sleep(2)
+        # The report shows the analysis as soon as it is ready
         st.switch_page("pages/report.py")
     
     else:
         st.warning("No responses recorded. Returning to dashboard...")
-        time.sleep(2)
-        st.switch_page("main.py")
+        redirect_at = st.session_state.setdefault('redirect_at', time.time() + REDIRECT_DELAY_SECONDS)
+        st.fragment(run_every=STATUS_REFRESH_SECONDS)(redirect_when_due)("main.py", redirect_at)
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,21 @@
 import streamlit as st
-import json
-from utils.database import get_interview_mock, get_interview_session
+import html
+from utils.auth import require_authentication, get_current_user_id
+from utils.session_cache import get_cached_interview, get_cached_feedback_fields, get_cached_responses
+from utils.benchmarks import get_score_percentile, describe_peer_group
+from utils.audio_archive import get_recording_path
+from utils.speech_metrics import summarize_speech_metrics, TARGET_WPM_RANGE
+from utils.completion_jobs import get_completion_status
+from utils.database import requeue_completion_job
+
+# How often the report checks on an analysis that is still running
+COMPLETION_REFRESH_SECONDS = 1
+
+# URL parameter carrying the open report's interview across reloads
+REPORT_QUERY_PARAM = "interview"
 
 # Check authentication
-if 'authenticated' not in st.session_state or not st.session_state.authenticated:
-    st.error("Please login to access this page")
-    if st.button("← Back to Login"):
-        st.switch_page("main.py")
-    st.stop()
+require_authentication()
 
 st.set_page_config(
     page_title="Interview Report - EchoPrep",
@@ -264,9 +272,25 @@ def get_score_label(score):
     else:
         return "Needs Improvement"
 
+@st.fragment(run_every=COMPLETION_REFRESH_SECONDS)
+def show_completion_progress(interview_id):
+    """Progress of the background save and analysis; reruns the whole report once it has finished"""
+    job = get_completion_status(interview_id)
+    if not job or job['status'] not in ('queued', 'running'):
+        st.rerun(scope="app")
+    
+    st.progress(job['progress'], text=job['label'])
+    if job['attempts'] > 1:
+        st.caption(f"Retrying (attempt {job['attempts']})...")
+    st.caption("You can leave this page; the analysis continues and your report will be here when you come back.")
+
 def main():
     """Main report function"""
     
+    # Reloads start a new session, so the interview id is restored from the page URL
+    if 'current_interview_id' not in st.session_state and st.query_params.get(REPORT_QUERY_PARAM, '').isdigit():
+        st.session_state.current_interview_id = int(st.query_params[REPORT_QUERY_PARAM])
+    
     # Check if interview ID is provided
     if 'current_interview_id' not in st.session_state:
         st.error("No interview selected. Please go back to dashboard and select an interview.")
@@ -275,13 +299,17 @@ def main():
         st.stop()
     
     # Get interview data
-    interview_data = get_interview_mock(st.session_state.current_interview_id)
-    if not interview_data:
+    interview_data, _ = get_cached_interview(st.session_state.current_interview_id)
+    if not interview_data or interview_data['user_id'] != get_current_user_id():
         st.error("Interview not found.")
         if st.button("← Back to Dashboard"):
             st.switch_page("main.py")
         st.stop()
     
+    # Page switches drop query parameters, so put the interview back for reloads
+    if st.query_params.get(REPORT_QUERY_PARAM) != str(interview_data['id']):
+        st.query_params[REPORT_QUERY_PARAM] = str(interview_data['id'])
+    
     # Header
     st.markdown("""
     <div class="main-container">
@@ -313,17 +341,26 @@ def main():
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Try to get session data (if available)
-    session_data = None
-    try:
-        session_data = get_interview_session(st.session_state.current_interview_id)
-    except:
-        pass
+    # A just-finished interview is saved and analyzed in the background; wait for it here
+    job = get_completion_status(st.session_state.current_interview_id)
+    if job and job['status'] in ('queued', 'running'):
+        show_completion_progress(st.session_state.current_interview_id)
+        st.stop()
+    if job and job['status'] == 'failed':
+        st.error(f"We could not analyze this interview: {job['error']}")
+        if st.button("🔄 Try Again", key="retry_analysis_btn"):
+            requeue_completion_job(job['id'])
+            st.rerun()
     
-    if session_data and 'feedback' in session_data:
+    # Only the feedback fields shown here are extracted from the stored JSON
+    feedback = get_cached_feedback_fields(
+        st.session_state.current_interview_id,
+        'overall_score', 'detailed_scores', 'strengths', 'areas_for_improvement', 'improvements', 'recommendations', 'analyzed'
+    )
+    
+    if feedback:
         try:
-            feedback = json.loads(session_data['feedback'])
-            overall_score = feedback.get('overall_score', 75)
+            overall_score = feedback['overall_score'] if feedback['overall_score'] is not None else 75
             
             # Score display
             score_class = get_score_class(overall_score)
@@ -338,8 +375,23 @@ def main():
             </div>
             """, unsafe_allow_html=True)
             
+            if feedback['analyzed'] is False:
+                st.caption("Sample feedback: AI analysis was not available, so this score is not graded.")
+            
+            # Peer comparison against the cached score distribution for this role and level
+            if feedback['overall_score'] is not None and feedback['analyzed'] is not False:
+                benchmark = get_score_percentile(
+                    interview_data.get('job_role'),
+                    interview_data.get('experience_level'),
+                    overall_score
+                )
+                if benchmark:
+                    peer_group = describe_peer_group(interview_data.get('job_role'), interview_data.get('experience_level'))
+                    st.info(f"📊 You scored better than {benchmark['percentile']}% of {peer_group} "
+                            f"({benchmark['sample_count']} interviews)")
+            
             # Detailed metrics
-            if 'detailed_scores' in feedback:
+            if feedback['detailed_scores']:
                 st.markdown('<div class="metrics-grid">', unsafe_allow_html=True)
                 for metric, score in feedback['detailed_scores'].items():
                     st.markdown(f"""
@@ -351,7 +403,7 @@ def main():
                 st.markdown('</div>', unsafe_allow_html=True)
             
             # Strengths
-            if 'strengths' in feedback and feedback['strengths']:
+            if feedback['strengths']:
                 st.markdown('<div class="feedback-section">', unsafe_allow_html=True)
                 st.markdown('<div class="section-title">💪 Strengths</div>', unsafe_allow_html=True)
                 
@@ -361,17 +413,18 @@ def main():
                 st.markdown('</div>', unsafe_allow_html=True)
             
             # Areas for improvement
-            if 'improvements' in feedback and feedback['improvements']:
+            improvements = feedback['areas_for_improvement'] or feedback['improvements']
+            if improvements:
                 st.markdown('<div class="feedback-section">', unsafe_allow_html=True)
                 st.markdown('<div class="section-title">🎯 Areas for Improvement</div>', unsafe_allow_html=True)
                 
-                for improvement in feedback['improvements']:
+                for improvement in improvements:
                     st.markdown(f'<div class="improvement-item">🔄 {improvement}</div>', unsafe_allow_html=True)
                 
                 st.markdown('</div>', unsafe_allow_html=True)
             
             # Recommendations
-            if 'recommendations' in feedback and feedback['recommendations']:
+            if feedback['recommendations']:
                 st.markdown('<div class="feedback-section">', unsafe_allow_html=True)
                 st.markdown('<div class="section-title">💡 Recommendations</div>', unsafe_allow_html=True)
                 
@@ -404,28 +457,53 @@ def main():
         """, unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
-    # Transcript section (if available)
-    if session_data and 'transcript' in session_data and session_data['transcript']:
+    # Transcript section, one stored row per answer
+    responses = get_cached_responses(st.session_state.current_interview_id)
+    
+    # Delivery metrics measured locally from the recorded answers
+    delivery = summarize_speech_metrics(responses)
+    if delivery and 'words_per_minute' in delivery:
+        st.markdown('<div class="feedback-section">', unsafe_allow_html=True)
+        st.markdown('<div class="section-title">🗣️ Delivery</div>', unsafe_allow_html=True)
+        
+        low, high = TARGET_WPM_RANGE
+        col_pace, col_pauses, col_longest, col_fillers = st.columns(4)
+        col_pace.metric("Speaking Pace", f"{delivery['words_per_minute']:.0f} wpm", help=f"A comfortable pace is {low}-{high} words per minute")
+        col_pauses.metric("Pauses per Minute", f"{delivery['pauses_per_minute']:.1f}", help="Silences of 0.3 seconds or longer")
+        col_longest.metric("Longest Pause", f"{delivery['longest_pause_seconds']:.1f}s")
+        col_fillers.metric("Filler Words", f"{delivery['fillers_per_100_words']:.1f} / 100 words")
+        
+        if any(delivery['pause_distribution'].values()):
+            st.bar_chart(delivery['pause_distribution'])
+        st.caption(f"Measured from {delivery['recorded_answers']} of {delivery['answers']} recorded answers")
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    if responses:
         st.markdown('<div class="transcript-section">', unsafe_allow_html=True)
         st.markdown('<div class="section-title">📝 Interview Transcript</div>', unsafe_allow_html=True)
         
-        # Parse and display transcript
-        transcript_lines = session_data['transcript'].split('\n\n')
-        
         st.markdown('<div class="transcript-box">', unsafe_allow_html=True)
-        for i, line_pair in enumerate(transcript_lines):
-            if line_pair.strip():
-                lines = line_pair.split('\n')
-                if len(lines) >= 2:
-                    question = lines[0].replace('Q: ', '')
-                    answer = lines[1].replace('A: ', '')
-                    
-                    st.markdown(f"""
-                    <div class="qa-pair">
-                        <div class="question-text">Q: {question}</div>
-                        <div class="answer-text">A: {answer}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
+        for response in responses:
+            question = html.escape(response['question'])
+            answer = html.escape(response['answer']).replace('\n', '<br>')
+            score = f" <em>({response['score']}%)</em>" if response['score'] is not None else ""
+            feedback = ""
+            if response['ai_feedback']:
+                feedback = f'<div class="answer-text">💡 {html.escape(response["ai_feedback"])}</div>'
+            
+            st.markdown(f"""
+            <div class="qa-pair">
+                <div class="question-text">Q: {question}{score}</div>
+                <div class="answer-text">A: {answer}</div>
+                {feedback}
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Archived recordings are only loaded when asked for and are served with range requests
+            recording_path = get_recording_path(response.get('audio_digest'))
+            if recording_path and st.toggle("🔊 Play recorded answer", key=f"play_recording_{response['id']}"):
+                st.audio(recording_path, format="audio/ogg")
         
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
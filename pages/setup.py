@@ -1,15 +1,27 @@
 import streamlit as st
-import json
-from utils.auth import get_current_user_id
-from utils.ai_services import conversational_setup_assistant, generate_interview_questions
-from utils.database import create_interview_mock, update_interview_questions
+import threading
+import time
+from utils.auth import require_authentication
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from utils.ai_services import (
+    conversational_setup_assistant,
+    fallback_interview_questions,
+    prefetch_interview_questions,
+    questions_for_duration,
+    MAX_QUESTION_COUNT
+)
+from utils.database import create_interview_mock
+from utils.question_index import select_distinct_questions
+
+# Longest time "Finish Setup" waits, in total, for background question generation before
+# falling back to the built-in questions
+QUESTION_WAIT_TIMEOUT = 30
+
+EXPERIENCE_OPTIONS = ["Entry Level (0-2 years)", "Mid Level (3-5 years)", "Senior Level (6-10 years)", "Lead/Principal (10+ years)"]
+INTERVIEW_TYPE_OPTIONS = ["Technical Interview", "Behavioral Interview", "Case Study Interview", "Mixed (Technical + Behavioral)"]
 
 # Check authentication
-if 'authenticated' not in st.session_state or not st.session_state.authenticated:
-    st.error("Please login to access this page")
-    if st.button("← Back to Login"):
-        st.switch_page("main.py")
-    st.stop()
+require_authentication()
 
 # Configure page
 st.set_page_config(
@@ -228,6 +240,104 @@ header {visibility: hidden;}
 </style>
 """, unsafe_allow_html=True)
 
+def cancel_speculative_generation(entry):
+    """Abandon a speculative generation: drop it if queued, skip its Gemini call if not started"""
+    entry['cancelled'].set()
+    entry['future'].cancel()
+
+def start_speculative_generation():
+    """Start generating questions in the background from the fields collected so far"""
+    config = st.session_state.interview_config
+    skills = config.get('skills')
+    cancelled = threading.Event()
+    future = prefetch_interview_questions(
+        config['job_role'],
+        config['experience_level'],
+        config['interview_type'],
+        skills or f"core {config['job_role']} skills",
+        # Duration is chosen last, so generate the longest set and trim it when setup finishes
+        MAX_QUESTION_COUNT,
+        cancelled=cancelled
+    )
+    
+    # The first three fields give a speculative set; skills give the refined one
+    speculative = st.session_state.setdefault('speculative_questions', {})
+    key = 'refined' if skills else 'base'
+    if key in speculative:
+        cancel_speculative_generation(speculative[key])
+    speculative[key] = {'future': future, 'cancelled': cancelled}
+
+def resolve_generated_questions():
+    """Return the refined question set, reusing the speculative one if refinement is unavailable
+    
+    All waiting shares one QUESTION_WAIT_TIMEOUT deadline; past it, fallback questions are used.
+    Near-duplicates within the set and of questions this user was asked before are dropped,
+    with fallback questions filling any gap.
+    """
+    config = st.session_state.interview_config
+    num_questions = questions_for_duration(config.get('duration'))
+    speculative = st.session_state.get('speculative_questions', {})
+    deadline = time.monotonic() + QUESTION_WAIT_TIMEOUT
+    
+    if not speculative:
+        start_speculative_generation()
+        speculative = st.session_state.speculative_questions
+    
+    questions = []
+    for key in ('refined', 'base'):
+        entry = speculative.get(key)
+        if entry is None:
+            continue
+        try:
+            questions = entry['future'].result(timeout=max(0.0, deadline - time.monotonic()))
+            if questions:
+                break
+        except FutureTimeoutError:
+            print(f"Question generation ({key}) missed the setup deadline")
+        except Exception as e:
+            print(f"Speculative question generation failed: {e}")
+    
+    # Whatever is still pending is no longer needed
+    for entry in speculative.values():
+        cancel_speculative_generation(entry)
+    
+    fallback = fallback_interview_questions(config['job_role'], config['experience_level'], config['skills'], MAX_QUESTION_COUNT)
+    if not questions:
+        questions = fallback
+    try:
+        return select_distinct_questions(st.session_state.user_id, questions, num_questions, extra_candidates=fallback)
+    except Exception as e:
+        print(f"Question deduplication failed: {e}")
+        return questions[:num_questions]
+
+def suggest_from_first_answer(user_input):
+    """Read the role, and any level, type or skills mentioned alongside it, from the first answer
+    
+    The assistant may answer with "null" strings for slots it did not find; those are dropped.
+    """
+    history = [f"{message['role']}: {message['content']}" for message in st.session_state.setup_conversation]
+    result = conversational_setup_assistant(user_input, history, known_info=st.session_state.interview_config)
+    extracted = result.get('extracted_info') or {}
+    return {
+        slot: value.strip() for slot, value in extracted.items()
+        if isinstance(value, str) and value.strip() and value.strip().lower() != 'null'
+    }
+
+def suggested_index(options, slot):
+    """Index of the option the first answer suggested for a slot, or the first option"""
+    suggestion = st.session_state.get('setup_suggestions', {}).get(slot)
+    if suggestion:
+        for index, option in enumerate(options):
+            if option.lower().startswith(suggestion.lower()):
+                return index
+    return 0
+
+def clear_setup_state():
+    """Remove setup wizard state from the session"""
+    for key in ['setup_conversation', 'setup_step', 'interview_config', 'speculative_questions', 'created_interview_id', 'setup_suggestions']:
+        if key in st.session_state:
+            del st.session_state[key]
+
 def main():
     """Main setup page function with clean UI"""
     
@@ -296,12 +406,16 @@ def main():
             st.markdown(f'<div class="conversation-container"><div class="message assistant-message">🤖 {welcome_msg}</div></div>', unsafe_allow_html=True)
         
         st.markdown('<div class="input-section">', unsafe_allow_html=True)
-        user_input = st.text_input("Your answer:", placeholder="e.g., Software Engineer, Data Scientist, Product Manager...", key="job_role_input")
+        user_input = st.text_input("Your answer:", placeholder="e.g., Software Engineer, or \"mid level backend developer, technical interview\"", key="job_role_input")
         st.markdown('</div>', unsafe_allow_html=True)
         
         if st.button("Continue", key="step1_submit", type="primary") and user_input:
+            # Anything else mentioned here preselects the answers in the next steps
+            with st.spinner("Reading your answer..."):
+                suggestions = suggest_from_first_answer(user_input)
+            st.session_state.setup_suggestions = suggestions
             st.session_state.setup_conversation.append({"role": "user", "content": user_input})
-            st.session_state.interview_config['job_role'] = user_input
+            st.session_state.interview_config['job_role'] = suggestions.get('job_role') or user_input.strip()
             st.session_state.setup_step = 2
             st.rerun()
     
@@ -318,7 +432,8 @@ def main():
         st.markdown('<div class="input-section">', unsafe_allow_html=True)
         experience_level = st.selectbox(
             "Select your experience level:",
-            ["Entry Level (0-2 years)", "Mid Level (3-5 years)", "Senior Level (6-10 years)", "Lead/Principal (10+ years)"],
+            EXPERIENCE_OPTIONS,
+            index=suggested_index(EXPERIENCE_OPTIONS, 'experience_level'),
             key="experience_select"
         )
         st.markdown('</div>', unsafe_allow_html=True)
@@ -342,7 +457,8 @@ def main():
         st.markdown('<div class="input-section">', unsafe_allow_html=True)
         interview_type = st.selectbox(
             "Choose interview type:",
-            ["Technical Interview", "Behavioral Interview", "Case Study Interview", "Mixed (Technical + Behavioral)"],
+            INTERVIEW_TYPE_OPTIONS,
+            index=suggested_index(INTERVIEW_TYPE_OPTIONS, 'interview_type'),
             key="interview_type_select"
         )
         st.markdown('</div>', unsafe_allow_html=True)
@@ -350,6 +466,7 @@ def main():
         if st.button("Next", key="step3_submit", type="primary"):
             st.session_state.setup_conversation.append({"role": "user", "content": interview_type})
             st.session_state.interview_config['interview_type'] = interview_type
+            start_speculative_generation()
             st.session_state.setup_step = 4
             st.rerun()
     
@@ -367,6 +484,7 @@ def main():
         skills = st.text_area(
             "List your key skills/technologies:",
             placeholder="e.g., Python, React, Machine Learning, AWS, SQL, Leadership, Project Management...",
+            value=st.session_state.get('setup_suggestions', {}).get('skills', ""),
             height=100,
             key="skills_input"
         )
@@ -375,6 +493,7 @@ def main():
         if st.button("Continue", key="step4_submit", type="primary") and skills:
             st.session_state.setup_conversation.append({"role": "user", "content": skills})
             st.session_state.interview_config['skills'] = skills
+            start_speculative_generation()
             st.session_state.setup_step = 5
             st.rerun()
     
@@ -399,11 +518,29 @@ def main():
         if st.button("Finish Setup", key="step5_submit", type="primary"):
             st.session_state.setup_conversation.append({"role": "user", "content": duration})
             st.session_state.interview_config['duration'] = duration
+            
+            # Persist the interview with its (usually already generated) questions
+            try:
+                with st.spinner("Preparing your interview questions..."):
+                    questions = resolve_generated_questions()
+                    config = st.session_state.interview_config
+                    st.session_state.created_interview_id = create_interview_mock(
+                        user_id=st.session_state.user_id,
+                        job_role=config['job_role'],
+                        experience_level=config['experience_level'],
+                        interview_type=config['interview_type'],
+                        skills=config['skills'],
+                        questions=questions
+                    )
+            except Exception as e:
+                st.error(f"Error creating interview: {str(e)}")
+                st.stop()
+            
             st.session_state.setup_step = 6
             st.rerun()
     
     elif st.session_state.setup_step == 6:
-        # Final step - save and create interview
+        # Final step - interview and questions were saved when setup finished
         st.markdown("""
         <div class="completion-card">
             <h2 class="completion-title">🎉 Setup Complete!</h2>
@@ -411,16 +548,8 @@ def main():
         </div>
         """, unsafe_allow_html=True)
         
-        # Save interview configuration
-        try:
-            interview_id = create_interview_mock(
-                user_id=st.session_state.user_id,
-                job_role=st.session_state.interview_config['job_role'],
-                experience_level=st.session_state.interview_config['experience_level'],
-                interview_type=st.session_state.interview_config['interview_type'],
-                skills=st.session_state.interview_config['skills']
-            )
-            
+        interview_id = st.session_state.get('created_interview_id')
+        if interview_id:
             st.markdown('<div class="action-buttons">', unsafe_allow_html=True)
             
             col1, col2 = st.columns(2)
@@ -428,31 +557,20 @@ def main():
             with col1:
                 if st.button("🚀 Start Interview Now", key="start_interview", type="primary"):
                     st.session_state.current_interview_id = interview_id
-                    # Clear setup state
-                    if 'setup_conversation' in st.session_state:
-                        del st.session_state.setup_conversation
-                    if 'setup_step' in st.session_state:
-                        del st.session_state.setup_step
-                    if 'interview_config' in st.session_state:
-                        del st.session_state.interview_config
+                    clear_setup_state()
                     st.switch_page("pages/interview.py")
             
             with col2:
                 if st.button("📊 Return to Dashboard", key="return_dashboard"):
-                    # Clear setup state
-                    if 'setup_conversation' in st.session_state:
-                        del st.session_state.setup_conversation
-                    if 'setup_step' in st.session_state:
-                        del st.session_state.setup_step
-                    if 'interview_config' in st.session_state:
-                        del st.session_state.interview_config
+                    clear_setup_state()
                     st.switch_page("main.py")
             
             st.markdown('</div>', unsafe_allow_html=True)
             
-        except Exception as e:
-            st.error(f"Error creating interview: {str(e)}")
+        else:
+            st.error("Error creating interview: setup did not complete.")
             if st.button("← Back to Dashboard", key="error_back"):
+                clear_setup_state()
                 st.switch_page("main.py")
     
     st.markdown('</div></div>', unsafe_allow_html=True)
@@ -0,0 +1,34 @@
+import pytest
+
+from utils.slot_extractor import LOCAL_EXTRACTION_THRESHOLD, extract_setup_slots
+
+# Inputs that once produced confident wrong extractions: (input, expected extracted_info,
+# whether the local result may skip Gemini)
+REGRESSION_CASES = [
+    ("Mid level backend dev, technical interview",
+     {"job_role": "Backend Developer", "experience_level": "Mid Level", "interview_type": "Technical", "skills": None}, True),
+    ("Can we do the rest of it tomorrow? I will express my thoughts at 3 pm",
+     {"job_role": None, "experience_level": None, "interview_type": None}, False),
+    ("Mid level dev, technical interview",
+     {"job_role": None, "experience_level": "Mid Level", "interview_type": "Technical", "skills": None}, True),
+    ("I lead the team and work with our architect",
+     {"experience_level": None}, False),
+    ("I am a tester", {}, False),
+    ("junior fronted developer with raect",
+     {"experience_level": "Entry Level", "skills": "React"}, False),
+    ("Senior backend developer, python and django, technical interview",
+     {"job_role": "Backend Developer", "experience_level": "Senior Level", "interview_type": "Technical", "skills": "Python, Django"}, True),
+    ("Lead engineer, Node.js and REST APIs, behavioral",
+     {"experience_level": "Lead/Principal", "interview_type": "Behavioral", "skills": "REST APIs, Node.js"}, True),
+    ("senior data scientist with 3 years",
+     {"job_role": "Data Scientist", "experience_level": "Mid Level"}, False),
+    ("go developer", {"job_role": "Software Engineer", "skills": "Go"}, False),
+    ("I am a developer", {"job_role": "Software Engineer"}, True),
+]
+
+@pytest.mark.parametrize("text, expected, skips_llm", REGRESSION_CASES)
+def test_regression_case(text, expected, skips_llm):
+    result = extract_setup_slots(text)
+    for slot, value in expected.items():
+        assert result["extracted_info"][slot] == value, slot
+    assert (result["confidence"] >= LOCAL_EXTRACTION_THRESHOLD) == skips_llm
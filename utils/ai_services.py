@@ -1,8 +1,12 @@
 import google.generativeai as genai
 import os
 import json
+import re
 import requests
-from typing import List, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Optional
+from utils.slot_extractor import extract_setup_slots, merge_extracted_info, LOCAL_EXTRACTION_THRESHOLD
 
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -13,24 +17,75 @@ if GEMINI_API_KEY:
 HUGGINGFACE_API_TOKEN = os.getenv("HUGGINGFACE_API_TOKEN")
 HF_API_URL = "https://api-inference.huggingface.co/models/"
 
-def generate_interview_questions(job_role: str, experience_level: str, interview_type: str, skills: str) -> List[str]:
+# Question count used when no interview duration is given
+DEFAULT_QUESTION_COUNT = 7
+MAX_QUESTION_COUNT = 20
+MINUTES_PER_QUESTION = 3
+
+# Interviews per batched generation prompt, to keep each response within output limits
+QUESTION_BATCH_SIZE = 10
+
+_QUESTION_NUMBERING = re.compile(r"^\s*(?:[-*•]|\d+[.)]|Q\d+[:.)])\s*")
+
+def questions_for_duration(duration) -> int:
+    """Number of questions for a duration in minutes or a setup label such as '30 minutes (8-12 questions)'"""
+    if duration is None:
+        return DEFAULT_QUESTION_COUNT
+    
+    match = re.search(r"\d+", str(duration))
+    if not match:
+        return DEFAULT_QUESTION_COUNT
+    
+    minutes = int(match.group())
+    return max(1, min(MAX_QUESTION_COUNT, round(minutes / MINUTES_PER_QUESTION)))
+
+def fallback_interview_questions(job_role: str, experience_level: str, skills: str, num_questions: int = DEFAULT_QUESTION_COUNT) -> List[str]:
+    """Generic questions used when Gemini is unavailable"""
+    questions = [
+        f"Tell me about yourself and your experience in {job_role}.",
+        f"What interests you most about working as a {experience_level} {job_role}?",
+        f"How would you approach a challenging project involving {skills}?",
+        "Describe a time when you had to learn a new technology quickly.",
+        "What are your career goals for the next 3-5 years?",
+        "Tell me about a time you disagreed with a teammate and how you resolved it.",
+        f"Which part of {skills} do you feel strongest in, and how have you applied it?",
+        "Describe a project you are proud of and your specific contribution to it.",
+        "How do you prioritize your work when facing several deadlines at once?",
+        "Tell me about a mistake you made at work and what you learned from it.",
+        f"What does a typical day look like for a {job_role}, in your view?",
+        "How do you keep your skills up to date?",
+        "Describe a time you had to explain a complex topic to a non-expert.",
+        "Tell me about a time you received critical feedback. How did you respond?",
+        f"What would you focus on during your first 90 days as a {job_role}?",
+        "Describe a situation where you had to work with incomplete information.",
+        "How do you approach debugging or troubleshooting a problem you have never seen before?",
+        "Tell me about a time you went beyond what was asked of you.",
+        "What kind of team environment helps you do your best work?",
+        "Do you have any questions for us about the role or the team?"
+    ]
+    return questions[:num_questions]
+
+def _parse_question_lines(text: str) -> List[str]:
+    """Split a model response into questions, dropping numbering and bullets"""
+    questions = []
+    for line in text.split('\n'):
+        question = _QUESTION_NUMBERING.sub('', line).strip()
+        if question:
+            questions.append(question)
+    return questions
+
+def generate_interview_questions(job_role: str, experience_level: str, interview_type: str, skills: str, num_questions: int = DEFAULT_QUESTION_COUNT) -> List[str]:
     """Generate interview questions using Gemini AI"""
     
     if not GEMINI_API_KEY:
         # Return sample questions if API key not configured
-        return [
-            f"Tell me about yourself and your experience in {job_role}.",
-            f"What interests you most about working as a {experience_level} {job_role}?",
-            f"How would you approach a challenging project involving {skills}?",
-            "Describe a time when you had to learn a new technology quickly.",
-            "What are your career goals for the next 3-5 years?"
-        ]
+        return fallback_interview_questions(job_role, experience_level, skills, num_questions)
     
     try:
         model = genai.GenerativeModel('gemini-pro')
         
         prompt = f"""
-        Generate 5-7 realistic interview questions for a {experience_level} {job_role} position.
+        Generate exactly {num_questions} realistic interview questions for a {experience_level} {job_role} position.
         
         Interview Type: {interview_type}
         Key Skills/Technologies: {skills}
@@ -49,28 +104,134 @@ def generate_interview_questions(job_role: str, experience_level: str, interview
         """
         
         response = model.generate_content(prompt)
-        questions = [q.strip() for q in response.text.split('\n') if q.strip()]
+        questions = _parse_question_lines(response.text)
         
-        return questions[:7]  # Limit to 7 questions max
+        return questions[:num_questions]
         
     except Exception as e:
         print(f"Error generating questions: {e}")
         # Return fallback questions
-        return [
-            f"Tell me about yourself and your experience in {job_role}.",
-            f"What interests you most about working as a {experience_level} {job_role}?",
-            f"How would you approach a challenging project involving {skills}?",
-            "Describe a time when you had to learn a new technology quickly.",
-            "What are your career goals for the next 3-5 years?"
-        ]
+        return fallback_interview_questions(job_role, experience_level, skills, num_questions)
 
-def analyze_interview_performance(transcript: str, job_role: str, experience_level: str, skills: str) -> Dict:
-    """Analyze interview performance using Gemini AI"""
+def _strip_code_fence(text: str) -> str:
+    """Remove a surrounding ```json fence from a model response"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        text = text.rsplit("```", 1)[0]
+    return text.strip()
+
+def _fallback_question_set(config: Dict) -> List[str]:
+    """Fallback questions for one batch entry"""
+    return fallback_interview_questions(
+        config['job_role'],
+        config['experience_level'],
+        config.get('skills', ''),
+        config.get('num_questions', DEFAULT_QUESTION_COUNT)
+    )
+
+def _generate_question_batch_chunk(configs: List[Dict]) -> List[List[str]]:
+    """Generate question sets for up to QUESTION_BATCH_SIZE interviews in a single Gemini call"""
+    if not GEMINI_API_KEY:
+        return [_fallback_question_set(config) for config in configs]
+    
+    interviews = "\n".join(
+        f"{index}. {config['experience_level']} {config['job_role']} | "
+        f"Type: {config['interview_type']} | Skills: {config.get('skills', '')} | "
+        f"Questions: {config.get('num_questions', DEFAULT_QUESTION_COUNT)}"
+        for index, config in enumerate(configs)
+    )
+    
+    try:
+        model = genai.GenerativeModel('gemini-pro')
+        
+        prompt = f"""
+        Generate realistic interview questions for each of the following {len(configs)} mock interviews.
+        
+        Interviews (index. level role | type | skills | number of questions):
+        {interviews}
+        
+        Requirements:
+        1. Generate exactly the requested number of questions for each interview
+        2. Questions should match the experience level, interview type and skills of that interview
+        3. Make questions realistic and commonly asked in actual interviews
+        
+        Return only JSON in this format, with one list per interview in the same order:
+        {{
+            "interviews": [
+                ["<question>", "<question>"]
+            ]
+        }}
+        """
+        
+        response = model.generate_content(prompt)
+        question_sets = json.loads(_strip_code_fence(response.text)).get("interviews", [])
+        
+        results = []
+        for index, config in enumerate(configs):
+            questions = question_sets[index] if index < len(question_sets) else []
+            questions = [str(q).strip() for q in questions if str(q).strip()]
+            count = config.get('num_questions', DEFAULT_QUESTION_COUNT)
+            results.append(questions[:count] if questions else _fallback_question_set(config))
+        return results
+        
+    except Exception as e:
+        print(f"Error generating question batch: {e}")
+        return [_fallback_question_set(config) for config in configs]
+
+def generate_interview_question_batch(configs: List[Dict]) -> List[List[str]]:
+    """Generate question sets for several interviews with one prompt per QUESTION_BATCH_SIZE interviews
+    
+    Each config needs job_role, experience_level and interview_type, and may set skills and num_questions.
+    Results are returned in the same order as configs.
+    """
+    results = []
+    for start in range(0, len(configs), QUESTION_BATCH_SIZE):
+        results.extend(_generate_question_batch_chunk(configs[start:start + QUESTION_BATCH_SIZE]))
+    return results
+
+# Shared pool for speculative question generation started while the setup wizard is still running
+_question_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="echoprep-questions")
+
+def _generate_unless_cancelled(cancelled: Optional[threading.Event], *args) -> List[str]:
+    """generate_interview_questions, skipped (no Gemini call) when cancelled was set while queued"""
+    if cancelled is not None and cancelled.is_set():
+        return []
+    return generate_interview_questions(*args)
+
+def prefetch_interview_questions(job_role: str, experience_level: str, interview_type: str, skills: str, num_questions: int = DEFAULT_QUESTION_COUNT, cancelled: Optional[threading.Event] = None) -> Future:
+    """Start generating interview questions in the background and return the pending Future
+    
+    Setting cancelled before the task starts skips its Gemini call, so abandoned requests do not
+    use quota; a call already in flight still completes.
+    """
+    return _question_executor.submit(_generate_unless_cancelled, cancelled, job_role, experience_level, interview_type, skills, num_questions)
+
+class AnalysisError(RuntimeError):
+    """Gemini did not produce a usable interview analysis"""
+
+def analyze_interview_performance(transcript: str, job_role: str, experience_level: str, skills: str, speech_metrics: str = "", raise_on_error: bool = False) -> Dict:
+    """Analyze interview performance using Gemini AI
+    
+    speech_metrics is an optional plain-text summary of measured delivery metrics
+    (pace, pauses, filler words) that the model should take into account.
+    
+    Placeholder feedback (no API key, or a failed request when raise_on_error is False)
+    carries "analyzed": false, and its scores are not grades. With raise_on_error, failed
+    requests and unparseable replies raise AnalysisError instead, so callers can retry.
+    """
     
     if not GEMINI_API_KEY:
         # Return sample feedback if API key not configured
         return {
+            "analyzed": False,
             "overall_score": 75,
+            "detailed_scores": {
+                "clarity": 78,
+                "technical_accuracy": 72,
+                "problem_solving": 74,
+                "confidence": 76
+            },
             "feedback": {
                 "clarity": "Good communication skills demonstrated throughout the interview.",
                 "technical_accuracy": "Showed understanding of key concepts related to the role.",
@@ -97,16 +258,29 @@ def analyze_interview_performance(transcript: str, job_role: str, experience_lev
     try:
         model = genai.GenerativeModel('gemini-pro')
         
+        delivery_section = ""
+        if speech_metrics:
+            delivery_section = f"""
+        Delivery metrics measured from the recorded answers (objective; use them for clarity and confidence):
+        {speech_metrics}
+        """
+        
         prompt = f"""
         Analyze this interview transcript for a {experience_level} {job_role} position.
         Focus on skills: {skills}
         
         Transcript:
         {transcript}
-        
+        {delivery_section}
         Provide a comprehensive analysis in JSON format with the following structure:
         {{
             "overall_score": <integer from 0-100>,
+            "detailed_scores": {{
+                "clarity": <integer from 0-100>,
+                "technical_accuracy": <integer from 0-100>,
+                "problem_solving": <integer from 0-100>,
+                "confidence": <integer from 0-100>
+            }},
             "feedback": {{
                 "clarity": "<analysis of communication clarity>",
                 "technical_accuracy": "<analysis of technical knowledge>",
@@ -131,11 +305,14 @@ def analyze_interview_performance(transcript: str, job_role: str, experience_lev
         
         # Try to parse JSON response
         try:
-            analysis = json.loads(response.text)
+            analysis = json.loads(_strip_code_fence(response.text))
             return analysis
-        except json.JSONDecodeError:
+        except json.JSONDecodeError as e:
+            if raise_on_error:
+                raise AnalysisError(f"Analysis reply was not valid JSON: {e}")
             # If JSON parsing fails, create structured response from text
             return {
+                "analyzed": False,
                 "overall_score": 75,
                 "feedback": {
                     "clarity": "Analysis completed - please review the detailed feedback below.",
@@ -148,9 +325,14 @@ def analyze_interview_performance(transcript: str, job_role: str, experience_lev
                 "recommendations": [response.text[:500] + "..."]
             }
         
+    except AnalysisError:
+        raise
     except Exception as e:
         print(f"Error analyzing performance: {e}")
+        if raise_on_error:
+            raise AnalysisError(f"Analysis request failed: {e}")
         return {
+            "analyzed": False,
             "overall_score": 70,
             "feedback": {
                 "clarity": "Unable to analyze due to technical issues.",
@@ -163,26 +345,47 @@ def analyze_interview_performance(transcript: str, job_role: str, experience_lev
             "recommendations": ["Keep practicing interview skills", "Review common interview questions"]
         }
 
-def conversational_setup_assistant(user_input: str, conversation_history: List[str]) -> Dict:
+# Follow-up question asked by the local assistant for each missing setup slot
+SETUP_SLOT_PROMPTS = {
+    "job_role": "What specific job role are you preparing for? For example: Software Engineer, Data Analyst, Product Manager, etc.",
+    "experience_level": "What's your experience level? Please choose: Entry Level, Mid Level, or Senior Level.",
+    "interview_type": "What type of interview would you like to practice: Technical, Behavioral, or Mixed?",
+    "skills": "Which key skills or technologies should the questions focus on? For example: Python, SQL, Machine Learning."
+}
+
+def local_setup_response(extracted_info: Dict, known_info: Dict = None) -> Dict:
+    """Build a setup assistant reply from locally extracted slots without calling Gemini"""
+    collected = merge_extracted_info(known_info or {}, extracted_info)
+    missing = [slot for slot in SETUP_SLOT_PROMPTS if not collected.get(slot)]
+    
+    acknowledged = [f"{slot.replace('_', ' ')}: {value}" for slot, value in extracted_info.items() if value]
+    prefix = f"Got it ({'; '.join(acknowledged)}). " if acknowledged else ""
+    
+    if missing:
+        response = prefix + SETUP_SLOT_PROMPTS[missing[0]]
+    else:
+        response = prefix + "Great! I have all the information needed to create your mock interview."
+    
+    return {
+        "response": response,
+        "extracted_info": {slot: value for slot, value in extracted_info.items() if value}
+    }
+
+def conversational_setup_assistant(user_input: str, conversation_history: List[str], known_info: Dict = None) -> Dict:
     """AI assistant for conversational interview setup"""
     
+    # Try the local rule-based extractor first; only low-confidence input goes to Gemini
+    local = extract_setup_slots(user_input)
+    if local["confidence"] >= LOCAL_EXTRACTION_THRESHOLD:
+        return local_setup_response(local["extracted_info"], known_info)
+    
     if not GEMINI_API_KEY:
-        # Simple rule-based responses if API key not configured
-        if "job" in user_input.lower() or "role" in user_input.lower():
-            return {
-                "response": "What specific job role are you preparing for? For example: Software Engineer, Data Analyst, Product Manager, etc.",
-                "extracted_info": {"job_role": user_input if len(user_input.split()) <= 3 else None}
-            }
-        elif "experience" in user_input.lower() or "level" in user_input.lower():
-            return {
-                "response": "What's your experience level? Please choose: Entry Level, Mid Level, or Senior Level.",
-                "extracted_info": {"experience_level": user_input if any(level in user_input.lower() for level in ['entry', 'mid', 'senior']) else None}
-            }
-        else:
-            return {
-                "response": "I'd love to help you set up your mock interview! Let's start with the job role you're preparing for.",
-                "extracted_info": {}
-            }
+        # Rule-based responses with whatever the extractor found if API key not configured
+        extracted_info = local["extracted_info"]
+        if not any(extracted_info.values()) and not (known_info or {}).get("job_role") and 0 < len(user_input.split()) <= 3:
+            # Short free-text answers are taken as a job role outside the gazetteer
+            extracted_info = {"job_role": user_input.strip()}
+        return local_setup_response(extracted_info, known_info)
     
     try:
         model = genai.GenerativeModel('gemini-pro')
@@ -0,0 +1,229 @@
+"""Cohort analytics over every analyzed interview: score distributions, percentiles, improvement.
+
+Python API:
+    from utils.analytics import cohort_report
+    report = cohort_report()
+
+CLI:
+    python -m utils.analytics --output-dir reports/
+"""
+import argparse
+import os
+import sqlite3
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.benchmarks import percent_below
+from utils.database import get_db_path, PROGRESS_DIMENSIONS, PLACEHOLDER_CLARITY_FEEDBACK, REAL_ANALYSIS_CONDITION
+
+# Snapshots of the bulk-loaded frames live next to the database and are reused
+# until the underlying tables change
+SNAPSHOT_DIR = os.path.join(os.path.dirname(get_db_path()), 'analytics_cache')
+
+# Part of every snapshot name; bump it when a loader query changes so old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+CATEGORY_COLUMNS = ['job_role', 'experience_level', 'interview_type']
+
+# Ten-point buckets; the last one, [90, 101), includes a perfect 100
+SCORE_BINS = list(range(0, 100, 10)) + [101]
+
+def _snapshot_format():
+    """Parquet when pyarrow is available, otherwise pickle"""
+    try:
+        import pyarrow  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        return 'pkl'
+
+def _table_fingerprint(conn, table):
+    """Cheap change marker for an append-mostly table: row count and highest id"""
+    count, max_id = conn.execute(f"SELECT COUNT(*), COALESCE(MAX(id), 0) FROM {table}").fetchone()
+    return f"{count}-{max_id}"
+
+def _load_with_snapshot(name, fingerprint, loader):
+    """Return a frame from its on-disk snapshot, rebuilding it when the fingerprint changed"""
+    extension = _snapshot_format()
+    path = os.path.join(SNAPSHOT_DIR, f"{name}-v{SNAPSHOT_VERSION}-{fingerprint}.{extension}")
+    if os.path.exists(path):
+        return pd.read_parquet(path) if extension == 'parquet' else pd.read_pickle(path)
+
+    frame = loader()
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    for stale in os.listdir(SNAPSHOT_DIR):
+        if stale.startswith(f"{name}-"):
+            os.remove(os.path.join(SNAPSHOT_DIR, stale))
+    if extension == 'parquet':
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_pickle(path)
+    return frame
+
+def load_interview_frame(use_snapshot: bool = True) -> pd.DataFrame:
+    """One row per analyzed interview session with typed, categorical columns
+
+    Dimension scores are pulled with json_extract in SQL, so no feedback JSON is parsed in Python.
+    Placeholder analyses are left out, as in the report's peer benchmarks.
+    """
+    dimension_columns = ", ".join(
+        f"json_extract(s.feedback, '$.detailed_scores.{dimension}') AS {dimension}"
+        for dimension in PROGRESS_DIMENSIONS
+    )
+    query = f"""
+        SELECT s.id AS session_id, s.interview_id, i.user_id, i.job_role, i.experience_level,
+               i.interview_type, s.overall_score, {dimension_columns}, s.created_at
+        FROM interview_sessions s
+        JOIN interviews i ON i.id = s.interview_id
+        WHERE s.overall_score IS NOT NULL AND {REAL_ANALYSIS_CONDITION}
+        ORDER BY s.id
+    """
+
+    conn = sqlite3.connect(get_db_path())
+    try:
+        def loader():
+            frame = pd.read_sql_query(query, conn, params=PLACEHOLDER_CLARITY_FEEDBACK)
+            for column in CATEGORY_COLUMNS:
+                frame[column] = frame[column].astype('category')
+            for column in ['overall_score'] + PROGRESS_DIMENSIONS:
+                frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('float32')
+            frame['session_id'] = frame['session_id'].astype('int64')
+            frame['interview_id'] = frame['interview_id'].astype('int64')
+            frame['user_id'] = frame['user_id'].astype('int64')
+            frame['created_at'] = pd.to_datetime(frame['created_at'])
+            return frame
+
+        if not use_snapshot:
+            return loader()
+        return _load_with_snapshot('interviews', _table_fingerprint(conn, 'interview_sessions'), loader)
+    finally:
+        conn.close()
+
+def load_response_frame(use_snapshot: bool = True) -> pd.DataFrame:
+    """One row per stored answer with its score and length, without the answer text"""
+    query = """
+        SELECT r.id AS response_id, r.interview_id, i.user_id, i.job_role, i.experience_level,
+               r.score, LENGTH(r.answer) AS answer_length, r.created_at
+        FROM responses r
+        JOIN interviews i ON i.id = r.interview_id
+        ORDER BY r.id
+    """
+
+    conn = sqlite3.connect(get_db_path())
+    try:
+        def loader():
+            frame = pd.read_sql_query(query, conn)
+            for column in ['job_role', 'experience_level']:
+                frame[column] = frame[column].astype('category')
+            frame['score'] = pd.to_numeric(frame['score'], errors='coerce').astype('float32')
+            frame['answer_length'] = frame['answer_length'].astype('int32')
+            frame['created_at'] = pd.to_datetime(frame['created_at'])
+            return frame
+
+        if not use_snapshot:
+            return loader()
+        return _load_with_snapshot('responses', _table_fingerprint(conn, 'responses'), loader)
+    finally:
+        conn.close()
+
+def score_distribution(frame: pd.DataFrame, by: Optional[list] = None) -> pd.DataFrame:
+    """Counts of overall scores per 10-point bucket, optionally split by columns such as job_role"""
+    buckets = pd.cut(frame['overall_score'], bins=SCORE_BINS, include_lowest=True, right=False)
+    if not by:
+        return buckets.value_counts(sort=False).rename('count').to_frame()
+    # Only role/level combinations that occur; every score bucket stays a column
+    counts = frame.groupby(by + [buckets], observed=True).size().unstack(fill_value=0)
+    return counts.reindex(columns=buckets.cat.categories, fill_value=0)
+
+def add_percentile_ranks(frame: pd.DataFrame) -> pd.DataFrame:
+    """Add each session's percentile (0-100) among sessions for the same role and level
+
+    Same definition as the report page (utils.benchmarks.percent_below): the share of peer
+    sessions that scored strictly below.
+    """
+    frame = frame.copy()
+    scores = frame.groupby(['job_role', 'experience_level'], observed=True)['overall_score']
+    below = scores.rank(method='min') - 1
+    frame['percentile'] = percent_below(below, scores.transform('size')).astype('float32')
+    return frame
+
+def improvement_slopes(frame: pd.DataFrame) -> pd.DataFrame:
+    """Least-squares slope of each user's overall score per attempt, from grouped sums"""
+    ordered = frame.sort_values(['user_id', 'created_at', 'session_id'])
+    x = ordered.groupby('user_id').cumcount().astype('float64')
+    y = ordered['overall_score'].astype('float64')
+
+    sums = pd.DataFrame({
+        'user_id': ordered['user_id'].to_numpy(),
+        'n': 1.0,
+        'x': x.to_numpy(),
+        'y': y.to_numpy(),
+        'xx': (x * x).to_numpy(),
+        'xy': (x * y).to_numpy()
+    }).groupby('user_id').sum()
+
+    denominator = sums['n'] * sums['xx'] - sums['x'] ** 2
+    slope = (sums['n'] * sums['xy'] - sums['x'] * sums['y']) / denominator.replace(0, np.nan)
+
+    grouped = ordered.groupby('user_id')['overall_score']
+    return pd.DataFrame({
+        'sessions': sums['n'].astype('int32'),
+        'first_score': grouped.first(),
+        'last_score': grouped.last(),
+        'average_score': grouped.mean(),
+        'slope_per_attempt': slope.astype('float32')
+    })
+
+def cohort_report(use_snapshot: bool = True) -> Dict[str, pd.DataFrame]:
+    """Score distributions, percentile ranks and improvement slopes over every analyzed interview"""
+    frame = load_interview_frame(use_snapshot)
+    ranked = add_percentile_ranks(frame)
+    return {
+        'distribution': score_distribution(frame),
+        'distribution_by_role_level': score_distribution(frame, by=['job_role', 'experience_level']),
+        'percentiles': ranked[['session_id', 'user_id', 'job_role', 'experience_level', 'overall_score', 'percentile']],
+        'improvement': improvement_slopes(frame),
+        'dimension_averages': frame.groupby(['job_role', 'experience_level'], observed=True)[PROGRESS_DIMENSIONS].mean()
+    }
+
+def main(argv=None):
+    """Command line entry point: print the cohort report, optionally saving each table as CSV"""
+    parser = argparse.ArgumentParser(description="Cohort analytics over every analyzed EchoPrep interview")
+    parser.add_argument("--output-dir", help="also write each report table to <output-dir>/<table>.csv")
+    parser.add_argument("--no-snapshot", action="store_true", help="reload from the database instead of the cached snapshot")
+    args = parser.parse_args(argv)
+
+    try:
+        report = cohort_report(use_snapshot=not args.no_snapshot)
+    except (OSError, sqlite3.Error, pd.errors.DatabaseError) as e:
+        print(f"❌ Cohort report failed: {e}")
+        return 1
+
+    sessions = len(report['percentiles'])
+    if not sessions:
+        print("❌ No analyzed interviews yet")
+        return 1
+
+    print(f"✅ {sessions} analyzed interviews from {len(report['improvement'])} users")
+    with pd.option_context('display.width', 160, 'display.max_columns', 20):
+        print("\nScore distribution:")
+        print(report['distribution'].to_string())
+        print("\nScore distribution by role and level:")
+        print(report['distribution_by_role_level'].to_string())
+        print("\nAverage dimension scores by role and level:")
+        print(report['dimension_averages'].round(1).to_string())
+        print("\nMost improved users (score points per attempt):")
+        improvement = report['improvement'][report['improvement']['sessions'] > 1]
+        print(improvement.sort_values('slope_per_attempt', ascending=False).head(10).round(2).to_string())
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name, table in report.items():
+            table.to_csv(os.path.join(args.output_dir, f"{name}.csv"))
+        print(f"\n✅ Wrote {len(report)} tables to {args.output_dir}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
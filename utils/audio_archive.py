@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from utils.database import get_db_path, get_expired_audio_digests, clear_audio_digests, get_referenced_audio_digests
+from utils.audio_jobs import AudioJobError, audio_from_payload, pcm_payload, run_audio_job
+
+# Answer recordings are stored once per distinct recording, named by a digest of the raw samples
+ARCHIVE_DIR = os.path.join(os.path.dirname(get_db_path()), 'audio_archive')
+ARCHIVE_EXTENSION = 'ogg'
+
+# Speech-oriented Opus settings: mono 16 kHz at 24 kbit/s is about 180 KB per minute
+ARCHIVE_SAMPLE_RATE = 16000
+ARCHIVE_BITRATE = "24k"
+
+# Recordings older than this are deleted; 0 keeps them forever
+AUDIO_RETENTION_DAYS = int(os.getenv("AUDIO_RETENTION_DAYS", "90"))
+RETENTION_SWEEP_SECONDS = 24 * 3600
+
+# Resampling and encoding a long answer on a busy server
+ARCHIVE_ENCODE_TIMEOUT = 120
+
+# Encoding is handed off the Streamlit script thread so moving to the next question never waits on
+# ffmpeg; these threads only wait for the audio worker processes that do the work
+_encode_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="echoprep-audio-archive")
+_sweep_lock = threading.Lock()
+_last_sweep = None
+
+def recording_digest(audio) -> str:
+    """Content address of an AudioSegment: SHA-256 of its raw samples and format"""
+    digest = hashlib.sha256(f"{audio.frame_rate}:{audio.channels}:{audio.sample_width}:".encode())
+    digest.update(audio.raw_data)
+    return digest.hexdigest()
+
+def archive_path(digest: str) -> str:
+    """File path for a digest, fanned out over two-character subdirectories"""
+    return os.path.join(ARCHIVE_DIR, digest[:2], f"{digest}.{ARCHIVE_EXTENSION}")
+
+def _encode(payload, path):
+    """Write a recording as Opus in an Ogg container, atomically (runs in an audio worker process)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        audio_from_payload(payload).set_channels(1).set_frame_rate(ARCHIVE_SAMPLE_RATE).export(
+            partial,
+            format="ogg",
+            codec="libopus",
+            bitrate=ARCHIVE_BITRATE,
+            parameters=["-application", "voip"]
+        )
+        os.replace(partial, path)
+    except Exception as e:
+        print(f"❌ Error archiving answer audio: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+
+def _archive(payload, path):
+    """Encode a recording on the audio pool; waits for a free slot rather than dropping it"""
+    try:
+        run_audio_job(_encode, payload, path, timeout=ARCHIVE_ENCODE_TIMEOUT, queue_timeout=ARCHIVE_ENCODE_TIMEOUT)
+    except AudioJobError as e:
+        print(f"❌ Error archiving answer audio: {e}")
+
+def archive_recording(audio, digest: Optional[str] = None) -> Optional[str]:
+    """Queue an answer recording for archiving and return its digest, or None for an empty recording
+
+    Identical recordings share one file, so saving the same answer twice costs no extra space.
+    Pass digest when recording_digest was already computed for this recording.
+    """
+    if audio is None or len(audio) == 0:
+        return None
+
+    digest = digest or recording_digest(audio)
+    path = archive_path(digest)
+    if not os.path.exists(path):
+        _encode_executor.submit(_archive, pcm_payload(audio), path)
+
+    schedule_retention_sweep()
+    return digest
+
+def get_recording_path(digest: Optional[str]) -> Optional[str]:
+    """Path of an archived recording, or None when it is missing or still being encoded"""
+    if not digest:
+        return None
+    path = archive_path(digest)
+    return path if os.path.exists(path) else None
+
+def apply_retention_policy(retention_days: int = AUDIO_RETENTION_DAYS) -> int:
+    """Delete recordings past retention and files no response refers to; returns files removed"""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return 0
+
+    removed = 0
+    if retention_days > 0:
+        expired = get_expired_audio_digests(retention_days)
+        for digest in expired:
+            path = archive_path(digest)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        clear_audio_digests(expired)
+
+    # Orphans come from answers that were recorded but never saved; give in-flight ones a day
+    referenced = get_referenced_audio_digests()
+    if referenced is None:
+        return removed
+    cutoff = time.time() - RETENTION_SWEEP_SECONDS
+    for directory, _, files in os.walk(ARCHIVE_DIR):
+        for name in files:
+            path = os.path.join(directory, name)
+            digest = name.split('.', 1)[0]
+            if digest not in referenced and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+def schedule_retention_sweep():
+    """Run the retention policy in the background at most once per RETENTION_SWEEP_SECONDS"""
+    global _last_sweep
+    now = time.monotonic()
+    with _sweep_lock:
+        if _last_sweep is not None and now - _last_sweep < RETENTION_SWEEP_SECONDS:
+            return
+        _last_sweep = now
+    _encode_executor.submit(apply_retention_policy)
@@ -0,0 +1,197 @@
+"""Process pools for CPU-heavy audio work: preprocessing, delivery metrics and speech synthesis.
+
+Jobs run in separate worker processes, so decoding, resampling and local speech models never
+hold the GIL of the Streamlit server and page reruns of every user stay responsive. Jobs take
+and return plain bytes, strings, tuples and dicts (never AudioSegment objects), which keeps
+pickling cheap. Recordings travel as raw PCM (see pcm_payload). Network-bound work such as
+speech recognition stays in the calling thread.
+
+AUDIO_WORKERS sets the audio pool size; 0 runs its jobs inline in the calling thread. At most
+AUDIO_MAX_PENDING jobs are queued or running at once, each job is waited on for at most its
+timeout, and worker processes are replaced after AUDIO_MAX_TASKS_PER_CHILD jobs so memory
+leaked by native libraries is returned. Speech synthesis runs on its own pool of TTS_WORKERS
+processes that are never recycled, so loaded voice models and the in-memory speech cache stay warm;
+it defaults to inline synthesis as well when AUDIO_WORKERS is 0.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from pydub import AudioSegment
+
+AUDIO_WORKERS = int(os.getenv("AUDIO_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+AUDIO_MAX_PENDING = int(os.getenv("AUDIO_MAX_PENDING", str(4 * max(1, AUDIO_WORKERS))))
+AUDIO_MAX_TASKS_PER_CHILD = int(os.getenv("AUDIO_MAX_TASKS_PER_CHILD", "50"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", str(max(0, min(2, AUDIO_WORKERS)))))
+TTS_MAX_PENDING = int(os.getenv("TTS_MAX_PENDING", str(4 * max(1, TTS_WORKERS))))
+
+# Default wait for a job's result, and for a free queue slot before giving up
+AUDIO_JOB_TIMEOUT = 30
+AUDIO_QUEUE_WAIT_SECONDS = 2
+
+class AudioJobError(RuntimeError):
+    """An audio job could not be run or did not finish"""
+
+class AudioQueueFull(AudioJobError):
+    """Every queue slot is taken; the server is saturated with audio work"""
+
+class AudioJobTimeout(AudioJobError):
+    """A job did not finish within its timeout"""
+
+def pcm_payload(audio) -> Dict:
+    """Raw samples and format of a pydub AudioSegment, ready to send to a worker process"""
+    return {
+        'data': audio.raw_data,
+        'frame_rate': audio.frame_rate,
+        'channels': audio.channels,
+        'sample_width': audio.sample_width
+    }
+
+def audio_from_payload(payload: Dict) -> AudioSegment:
+    """Inverse of pcm_payload"""
+    return AudioSegment(
+        data=payload['data'],
+        frame_rate=payload['frame_rate'],
+        channels=payload['channels'],
+        sample_width=payload['sample_width']
+    )
+
+# Jobs: module-level functions, so worker processes can import them by name
+
+def preprocess_recording(payload: Dict) -> bytes:
+    """WAV bytes of a recording, for playback"""
+    return audio_from_payload(payload).export(format="wav").read()
+
+def measure_delivery(payload: Dict, transcript: str) -> Dict:
+    """Pace, pause and filler metrics of a recorded answer (see utils.speech_metrics)"""
+    from utils.speech_metrics import analyze_answer_audio
+    return analyze_answer_audio(audio_from_payload(payload), transcript)
+
+def synthesize_text(text: str) -> Tuple[bytes, Optional[str], Optional[float]]:
+    """Speech for text from the configured TTS engine, with the engine name and synthesis seconds
+
+    Latency is returned rather than recorded so the server process, not the worker, keeps the
+    stats (see utils.tts.synthesize_timed).
+    """
+    from utils.tts import synthesize_timed
+    return synthesize_timed(text)
+
+_worker_main = types.ModuleType("__main__")
+_worker_main_lock = threading.Lock()
+
+class _WorkerProcess(multiprocessing.context.SpawnProcess):
+    """Spawned worker that does not re-run the parent's __main__
+
+    Under Streamlit, __main__ is the page script of the latest run, and spawn would execute
+    it again in every new worker. Jobs are imported by module name, so workers start from a
+    bare __main__ instead.
+    """
+
+    def start(self):
+        with _worker_main_lock:
+            page = sys.modules['__main__']
+            sys.modules['__main__'] = _worker_main
+            try:
+                super().start()
+            finally:
+                # Streamlit may have started the next run meanwhile; keep its module then
+                if sys.modules['__main__'] is _worker_main:
+                    sys.modules['__main__'] = page
+
+class _WorkerContext(multiprocessing.context.SpawnContext):
+    Process = _WorkerProcess
+
+class _JobPool:
+    """A lazily started process pool with a bounded number of queued or running jobs"""
+
+    def __init__(self, workers, max_pending, max_tasks_per_child=None):
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+
+    def get(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                options = {}
+                if self.max_tasks_per_child and sys.version_info >= (3, 11):
+                    options['max_tasks_per_child'] = self.max_tasks_per_child
+                # Spawned workers start clean instead of forking a server full of threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_WorkerContext(),
+                    **options
+                )
+            return self._pool
+
+    def replace(self, stale: ProcessPoolExecutor):
+        """Send new jobs to a fresh pool; the stale one finishes its running jobs and exits"""
+        with self._lock:
+            if self._pool is stale:
+                self._pool = None
+        stale.shutdown(wait=False)
+
+    def submit(self, func, args, queue_timeout):
+        """Queue a job, returning its future and the executor it went to (None when run inline)"""
+        if not self._slots.acquire(timeout=queue_timeout):
+            raise AudioQueueFull("Too many audio jobs in progress")
+
+        pool = None
+        try:
+            if self.workers <= 0:
+                future = Future()
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                pool = self.get()
+                try:
+                    future = pool.submit(func, *args)
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); start over with a fresh pool
+                    self.replace(pool)
+                    pool = self.get()
+                    future = pool.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future, pool
+
+_audio_pool = _JobPool(AUDIO_WORKERS, AUDIO_MAX_PENDING, AUDIO_MAX_TASKS_PER_CHILD)
+_tts_pool = _JobPool(TTS_WORKERS, TTS_MAX_PENDING)
+
+def _pool_for(func) -> _JobPool:
+    """Synthesis goes to the warm TTS pool, every other job to the recycled audio pool"""
+    return _tts_pool if func is synthesize_text else _audio_pool
+
+def submit_audio_job(func, *args, queue_timeout: float = AUDIO_QUEUE_WAIT_SECONDS) -> Future:
+    """Queue func(*args) on its pool; raises AudioQueueFull when no slot frees up within queue_timeout"""
+    return _pool_for(func).submit(func, args, queue_timeout)[0]
+
+def run_audio_job(func, *args, timeout: float = AUDIO_JOB_TIMEOUT, queue_timeout: float = AUDIO_QUEUE_WAIT_SECONDS):
+    """Run func(*args) on its pool and return its result
+
+    Raises AudioQueueFull or AudioJobTimeout, or whatever the job itself raised. A job that
+    times out while running keeps its worker busy, so the pool is replaced and the stuck
+    worker exits once the job ends; its queue slot stays taken until then.
+    """
+    job_pool = _pool_for(func)
+    future, pool = job_pool.submit(func, args, queue_timeout)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        if not future.cancel():
+            job_pool.replace(pool)
+        raise AudioJobTimeout(f"Audio job {func.__name__} did not finish within {timeout:g}s")
+    except BrokenProcessPool as e:
+        job_pool.replace(pool)
+        raise AudioJobError(f"Audio worker stopped unexpectedly: {e}")
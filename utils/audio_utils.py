@@ -1,41 +1,171 @@
 import requests
 import io
 import os
-import tempfile
-from gtts import gTTS
+import re
+import uuid
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
 import streamlit as st
+import streamlit.components.v1 as components
 import base64
 import json
 import speech_recognition as sr
+from utils.audio_jobs import AudioJobError, pcm_payload, preprocess_recording, run_audio_job, synthesize_text
+from utils.tts import cached_speech, record_latency
 from audiorecorder import audiorecorder
 
 # Hugging Face API configuration
 HUGGINGFACE_API_TOKEN = os.getenv("HUGGINGFACE_API_TOKEN")
 HF_STT_MODEL = "openai/whisper-base"
 
+# Background synthesis of upcoming questions; each session keeps at most
+# TTS_PREFETCH_CACHE_SIZE questions (pending or ready) in its own cache
+TTS_PREFETCH_CACHE_SIZE = 4
+TTS_WAIT_TIMEOUT = 20
+
+# Longest wait for Google Speech Recognition to answer
+STT_REQUEST_TIMEOUT = 30
+
+# Streaming playback: sentences shorter than this are merged with the next one,
+# so tiny chunks don't add audible gaps
+MIN_STREAM_CHUNK_CHARS = 40
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+")
+
+_tts_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="echoprep-tts")
+
+def synthesize_speech(text: str) -> bytes:
+    """Audio bytes for text from the configured TTS engine (see utils.tts), synthesized in a
+    TTS worker process unless already cached; raises on failure, so it is safe to call off
+    the script thread"""
+    audio = cached_speech(text)
+    if audio is not None:
+        return audio
+    
+    audio, engine, seconds = run_audio_job(synthesize_text, text, timeout=TTS_WAIT_TIMEOUT)
+    if engine is not None:
+        record_latency(engine, seconds)
+    return audio
+
 def text_to_speech(text: str) -> bytes:
-    """Convert text to speech using gTTS (Google Text-to-Speech)"""
+    """Convert text to speech with the configured engine (Piper, espeak-ng or gTTS)"""
     try:
-        # Use gTTS as it's free and reliable
-        tts = gTTS(text=text, lang='en', slow=False)
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-            tts.save(tmp_file.name)
-            
-            # Read the audio data
-            with open(tmp_file.name, 'rb') as audio_file:
-                audio_data = audio_file.read()
-            
-            # Clean up temporary file
-            os.unlink(tmp_file.name)
-            
-            return audio_data
-            
+        return synthesize_speech(text)
     except Exception as e:
         st.error(f"Error in text-to-speech: {e}")
         return None
 
+def prefetch_speech(cache: OrderedDict, text: str):
+    """Start synthesizing text in the background unless cache already holds it"""
+    if text in cache:
+        cache.move_to_end(text)
+        return
+    
+    cache[text] = _tts_executor.submit(synthesize_speech, text)
+    while len(cache) > TTS_PREFETCH_CACHE_SIZE:
+        _, stale = cache.popitem(last=False)
+        stale.cancel()
+
+def get_prefetched_speech(cache: OrderedDict, text: str, timeout: float = TTS_WAIT_TIMEOUT) -> bytes:
+    """Audio for text from the prefetch cache, starting synthesis now if it was never requested"""
+    prefetch_speech(cache, text)
+    try:
+        return cache[text].result(timeout=timeout)
+    except Exception as e:
+        # Drop the failed entry so the next request retries
+        cache.pop(text, None)
+        st.error(f"Error in text-to-speech: {e}")
+        return None
+
+def is_speech_ready(cache: OrderedDict, text: str) -> bool:
+    """Whether prefetched audio for text finished synthesizing successfully"""
+    future = cache.get(text)
+    return future is not None and future.done() and not future.cancelled() and future.exception() is None
+
+def split_speech_chunks(text: str) -> List[str]:
+    """Split text at sentence boundaries, merging short sentences into the following one"""
+    chunks = []
+    pending = ""
+    for sentence in _SENTENCE_BOUNDARY.split(text.strip()):
+        pending = f"{pending} {sentence}".strip()
+        if len(pending) >= MIN_STREAM_CHUNK_CHARS:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks and len(pending) < MIN_STREAM_CHUNK_CHARS:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+def stream_speech(text: str, timeout: float = TTS_WAIT_TIMEOUT) -> Iterator[bytes]:
+    """Yield audio for text one chunk at a time, in order
+    
+    Every chunk is submitted at once, so later sentences synthesize while earlier ones
+    play and the first audio is ready after a single sentence rather than the whole text.
+    """
+    futures = [_tts_executor.submit(synthesize_speech, chunk) for chunk in split_speech_chunks(text)]
+    try:
+        for future in futures:
+            yield future.result(timeout=timeout)
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _speech_chunk_html(audio_data: bytes, stream_id: str) -> str:
+    """Hidden player that starts once the previous chunk of the same stream has finished
+    
+    Chunks render in separate component iframes, so they chain through a promise kept on
+    the parent window (falling back to immediate playback if it is not reachable).
+    """
+    audio_base64 = base64.b64encode(audio_data).decode()
+    return f"""
+    <audio id="chunk" src="data:{audio_mime_type(audio_data)};base64,{audio_base64}"></audio>
+    <script>
+    const audio = document.getElementById("chunk");
+    let host = window;
+    try {{ window.parent.document; host = window.parent; }} catch (e) {{}}
+    const queues = host.__echoprepSpeech = host.__echoprepSpeech || {{}};
+    const previous = queues["{stream_id}"] || Promise.resolve();
+    queues["{stream_id}"] = previous.then(() => new Promise((resolve) => {{
+        audio.onended = resolve;
+        audio.onerror = resolve;
+        audio.play().catch(resolve);
+    }}));
+    </script>
+    """
+
+def play_speech_stream(text: str) -> bool:
+    """Speak text sentence by sentence, sending each chunk to the browser as soon as it is synthesized"""
+    stream_id = uuid.uuid4().hex
+    played = False
+    try:
+        for audio_data in stream_speech(text):
+            components.html(_speech_chunk_html(audio_data, stream_id), height=0)
+            played = True
+    except Exception as e:
+        st.error(f"Error in text-to-speech: {e}")
+    return played
+
+def audio_mime_type(audio_data: bytes) -> str:
+    """MIME type of encoded audio from its leading bytes; local engines produce WAV, gTTS MP3"""
+    if audio_data[:4] == b"RIFF":
+        return "audio/wav"
+    if audio_data[:4] == b"OggS":
+        return "audio/ogg"
+    return "audio/mp3"
+
+def estimate_audio_seconds(audio_data: bytes) -> float:
+    """Playback length of synthesized audio: exact for WAV, estimated from gTTS's 32 kbit/s MP3 otherwise"""
+    if audio_data[:4] == b"RIFF":
+        try:
+            with wave.open(io.BytesIO(audio_data)) as wav_file:
+                return wav_file.getnframes() / float(wav_file.getframerate())
+        except wave.Error:
+            pass
+    return len(audio_data) * 8 / 32000.0
+
 def create_audio_player(audio_data: bytes, autoplay: bool = False) -> str:
     """Create HTML audio player for Streamlit"""
     if not audio_data:
@@ -43,6 +173,7 @@ def create_audio_player(audio_data: bytes, autoplay: bool = False) -> str:
     
     # Encode audio data to base64
     audio_base64 = base64.b64encode(audio_data).decode()
+    mime_type = audio_mime_type(audio_data)
     
     # Create HTML audio element
     autoplay_attr = "autoplay" if autoplay else ""
@@ -50,7 +181,7 @@ def create_audio_player(audio_data: bytes, autoplay: bool = False) -> str:
     audio_html = f"""
     <div class="audio-player">
         <audio controls {autoplay_attr} style="width: 100%;">
-            <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
+            <source src="data:{mime_type};base64,{audio_base64}" type="{mime_type}">
             Your browser does not support the audio element.
         </audio>
     </div>
@@ -58,40 +189,25 @@ def create_audio_player(audio_data: bytes, autoplay: bool = False) -> str:
     
     return audio_html
 
-def get_audio_recorder():
-    """Get audio recorder widget with better UI"""
-    from streamlit_audiorecorder import audiorecorder
+def get_audio_recorder(key=None):
+    """Recorder widget returning the recording as an AudioSegment (empty until something is recorded)
     
-    st.markdown("### 🎤 Voice Response")
-    st.markdown("Click the record button below to record your answer:")
-    
-    # Use the audiorecorder component
-    audio = audiorecorder("🎤 Start Recording", "⏹️ Stop Recording")
-    
-    return audio
+    Give each question its own key so a recording never carries over to the next question.
+    """
+    return audiorecorder("🎤 Start Recording", "⏹️ Stop Recording", key=key)
 
 def speech_to_text_local(audio_data) -> str:
     """Convert speech to text using local speech recognition"""
     try:
-        # Initialize recognizer
-        r = sr.Recognizer()
-        
-        # If audio_data is from audiorecorder, save it to a temporary file
-        if hasattr(audio_data, 'export'):
-            # Export audio to wav format
-            audio_data.export("temp_audio.wav", format="wav")
-            
-            # Use speech recognition on the file
-            with sr.AudioFile("temp_audio.wav") as source:
-                audio = r.record(source)
-                
-            # Clean up temporary file
-            os.remove("temp_audio.wav")
-            
-            # Recognize speech using Google Speech Recognition
-            text = r.recognize_google(audio)
-            return text
-            
+        # Recordings from audiorecorder are AudioSegments; decoding runs in an audio worker
+        # process, the network-bound recognition request in this thread
+        if hasattr(audio_data, 'raw_data'):
+            wav_data = run_audio_job(preprocess_recording, pcm_payload(audio_data))
+            recognizer = sr.Recognizer()
+            recognizer.operation_timeout = STT_REQUEST_TIMEOUT
+            with sr.AudioFile(io.BytesIO(wav_data)) as source:
+                audio = recognizer.record(source)
+            return recognizer.recognize_google(audio)
         else:
             return "Could not process audio. Please try again or type your response."
             
@@ -99,6 +215,9 @@ def speech_to_text_local(audio_data) -> str:
         return "Could not understand audio. Please try again or type your response."
     except sr.RequestError as e:
         return f"Could not request results; {e}. Please type your response."
+    except AudioJobError as e:
+        print(f"Speech recognition unavailable: {e}")
+        return "Speech recognition is busy right now. Please try again or type your response."
     except Exception as e:
         st.error(f"Error in speech recognition: {e}")
         return "Error processing audio. Please type your response."
@@ -133,7 +252,7 @@ def speech_to_text_huggingface(audio_data: bytes) -> str:
 def play_audio_streamlit(audio_data: bytes, autoplay: bool = True):
     """Play audio in Streamlit using st.audio"""
     if audio_data:
-        st.audio(audio_data, format='audio/mp3', autoplay=autoplay)
+        st.audio(audio_data, format=audio_mime_type(audio_data), autoplay=autoplay)
 
 def get_microphone_input():
     """Get microphone input using streamlit-webrtc (placeholder implementation)"""
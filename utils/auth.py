@@ -1,13 +1,326 @@
+import base64
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
 import streamlit as st
+import streamlit.components.v1 as components
+
+from utils.database import (
+    PasswordHasherBusy,
+    verify_user,
+    get_db_path,
+    create_session_record,
+    get_session_record,
+    delete_session_record
+)
+
+# Failed sign-in budgets: burst size and seconds for one failed attempt to expire
+USERNAME_MAX_FAILURES = 5
+USERNAME_FAILURE_WINDOW = 60
+IP_MAX_FAILURES = 20
+IP_FAILURE_WINDOW = 6
+
+# Upper bound on tracked usernames/IPs; least recently seen keys are evicted first
+THROTTLE_MAX_KEYS = 10000
+
+# Login sessions: lifetime, browser cookie carrying the token across reloads, the URL
+# parameter older versions used for it (stripped on sight), and the in-memory cache in front
+# of the sessions table (entries are re-checked in SQLite after SESSION_CACHE_TTL so
+# revocations from other processes are picked up)
+SESSION_TTL = 24 * 3600
+SESSION_COOKIE = "echoprep_session"
+SESSION_QUERY_PARAM = "session"
+SESSION_CACHE_TTL = 300
+SESSION_CACHE_MAX_ENTRIES = 4096
+
+class TokenBucketThrottle:
+    """In-process token buckets keyed by username or IP with bounded memory
+
+    Each failed attempt takes a token and tokens refill at one per refill_seconds,
+    so failures expire on their own. Full buckets are dropped to keep memory small.
+    """
+
+    def __init__(self, capacity, refill_seconds, max_keys=THROTTLE_MAX_KEYS):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokens(self, key, now):
+        """Current token count for a key, dropping buckets that have fully refilled"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.capacity
+        tokens, updated_at = bucket
+        tokens = min(self.capacity, tokens + (now - updated_at) / self.refill_seconds)
+        if tokens >= self.capacity:
+            del self._buckets[key]
+        return tokens
+
+    def allow(self, key):
+        """Whether another attempt is allowed for key right now"""
+        with self._lock:
+            return self._tokens(key, time.monotonic()) >= 1
+
+    def retry_after(self, key):
+        """Seconds until key gets its next token"""
+        with self._lock:
+            tokens = self._tokens(key, time.monotonic())
+            return max(0.0, (1 - tokens) * self.refill_seconds)
+
+    def record_failure(self, key):
+        """Take a token for a failed attempt"""
+        with self._lock:
+            now = time.monotonic()
+            self._buckets[key] = (max(0.0, self._tokens(key, now) - 1), now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+    def reset(self, key):
+        """Forget failures for key, e.g. after a successful sign-in"""
+        with self._lock:
+            self._buckets.pop(key, None)
+
+_username_throttle = TokenBucketThrottle(USERNAME_MAX_FAILURES, USERNAME_FAILURE_WINDOW)
+_ip_throttle = TokenBucketThrottle(IP_MAX_FAILURES, IP_FAILURE_WINDOW)
+
+def _parse_trusted_proxies(value):
+    """Networks from a comma-separated list of proxy IPs/CIDRs, skipping invalid entries"""
+    networks = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            print(f"❌ Ignoring invalid TRUSTED_PROXIES entry: {item}")
+    return networks
+
+# Reverse proxies whose X-Forwarded-For is honored; empty means the header is ignored.
+# Streamlit reports loopback peers as no address, so list 127.0.0.1 for a proxy on the same host.
+TRUSTED_PROXIES = _parse_trusted_proxies(os.getenv("TRUSTED_PROXIES", ""))
+
+def _is_trusted_proxy(address):
+    """Whether an address falls inside TRUSTED_PROXIES"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+def get_client_ip():
+    """Client IP for the current Streamlit session, used to key sign-in throttling
+
+    The connection's own address is used unless it belongs to a TRUSTED_PROXIES entry; then
+    X-Forwarded-For is read from the right and the first hop that is not a trusted proxy wins.
+    Entries left of it are set by the client and never trusted.
+    """
+    context = st.context
+    if not hasattr(context, 'ip_address'):
+        # Fail loudly rather than silently dropping the per-IP budget
+        raise RuntimeError("st.context.ip_address is unavailable; upgrade streamlit to 1.45 or later")
+    peer = context.ip_address
+    if not TRUSTED_PROXIES or not _is_trusted_proxy(peer or '127.0.0.1'):
+        return peer
+
+    forwarded = context.headers.get('X-Forwarded-For') or ''
+    hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+def authenticate_user(username, password, client_ip=None):
+    """Throttled credential check; returns (user, error_message)
+
+    Attempts over the per-username or per-IP budget are rejected before the
+    database or the password hasher is touched.
+    """
+    username_key = username.strip().lower()
+
+    for throttle, key in ((_username_throttle, username_key), (_ip_throttle, client_ip)):
+        if key and not throttle.allow(key):
+            wait = int(throttle.retry_after(key)) + 1
+            return None, f"Too many failed sign-in attempts. Please try again in {wait} seconds."
+
+    try:
+        user = verify_user(username, password)
+    except PasswordHasherBusy:
+        # Overload, not a wrong password: nothing counts against the budgets
+        return None, "Sign-in is busy right now. Please try again in a moment."
+    if user:
+        _username_throttle.reset(username_key)
+        return user, None
+
+    _username_throttle.record_failure(username_key)
+    if client_ip:
+        _ip_throttle.record_failure(client_ip)
+    return None, "Invalid username or password"
+
+def _load_session_secret():
+    """Signing key from SESSION_SECRET, or a random key kept next to the database"""
+    secret = os.getenv("SESSION_SECRET")
+    if secret:
+        return secret.encode()
+
+    secret_path = os.path.join(os.path.dirname(get_db_path()), '.session_secret')
+    try:
+        with open(secret_path, 'rb') as secret_file:
+            return secret_file.read()
+    except FileNotFoundError:
+        secret = secrets.token_bytes(32)
+        fd = os.open(secret_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as secret_file:
+            secret_file.write(secret)
+        return secret
+
+_session_secret = _load_session_secret()
+_session_cache = OrderedDict()
+_session_cache_lock = threading.Lock()
+
+def _sign(payload):
+    """URL-safe HMAC signature of a token payload"""
+    digest = hmac.new(_session_secret, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+def _token_hash(token):
+    """Database key for a token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def issue_session_token(user):
+    """Create a signed, expiring session token for a verified user"""
+    expires_at = int(time.time()) + SESSION_TTL
+    payload = f"{secrets.token_urlsafe(24)}.{expires_at}"
+    token = f"{payload}.{_sign(payload)}"
+
+    if not create_session_record(_token_hash(token), user['id'], expires_at):
+        return None
+    with _session_cache_lock:
+        _session_cache[token] = ({'id': user['id'], 'username': user['username']}, time.monotonic() + SESSION_CACHE_TTL)
+    return token
+
+def validate_session_token(token):
+    """Return the user for a valid token; signature and expiry are checked before any lookup"""
+    if not token:
+        return None
+    try:
+        session_id, expires_at, signature = token.split('.')
+        expires_at = int(expires_at)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(f"{session_id}.{expires_at}")) or expires_at < time.time():
+        return None
+
+    now = time.monotonic()
+    with _session_cache_lock:
+        cached = _session_cache.get(token)
+        if cached and cached[1] > now:
+            _session_cache.move_to_end(token)
+            return dict(cached[0])
+
+    record = get_session_record(_token_hash(token))
+    with _session_cache_lock:
+        if not record:
+            _session_cache.pop(token, None)
+            return None
+        user = {'id': record['id'], 'username': record['username']}
+        _session_cache[token] = (user, now + SESSION_CACHE_TTL)
+        _session_cache.move_to_end(token)
+        while len(_session_cache) > SESSION_CACHE_MAX_ENTRIES:
+            _session_cache.popitem(last=False)
+    return dict(user)
+
+def revoke_session_token(token):
+    """Invalidate a session token"""
+    if not token:
+        return
+    with _session_cache_lock:
+        _session_cache.pop(token, None)
+    delete_session_record(_token_hash(token))
+
+def _set_session_state(user, token):
+    """Mark the Streamlit session as signed in"""
+    st.session_state.logged_in = True
+    st.session_state.authenticated = True
+    st.session_state.user_id = user['id']
+    st.session_state.username = user['username']
+    st.session_state.session_token = token
+
+def _write_session_cookie(token):
+    """Store the session token in a browser cookie, or expire the cookie when token is None
+
+    Streamlit cannot set response headers, so the cookie is written by a script in a
+    zero-height component; the browser sends it with the next page load, where
+    st.context.cookies reads it.
+    """
+    cookie = f"{SESSION_COOKIE}={token or ''}; Max-Age={SESSION_TTL if token else 0}; Path=/; SameSite=Strict"
+    components.html(
+        f"""<script>
+        window.parent.document.cookie = {json.dumps(cookie)}
+            + (window.parent.location.protocol === "https:" ? "; Secure" : "");
+        </script>""",
+        height=0
+    )
+
+def start_session(user):
+    """Sign a verified user in; the token is saved to the session cookie on the next run"""
+    token = issue_session_token(user)
+    _set_session_state(user, token)
+    st.session_state.session_cookie_pending = bool(token)
+
+def restore_session():
+    """Restore the signed-in user from the session token, surviving reruns, reloads and reconnects"""
+    # Tokens never belong in the URL, where they end up in history, logs and referrers
+    if SESSION_QUERY_PARAM in st.query_params:
+        del st.query_params[SESSION_QUERY_PARAM]
+
+    cookie_token = (getattr(st.context, 'cookies', None) or {}).get(SESSION_COOKIE)
+    token = st.session_state.get('session_token') or cookie_token
+    if not token and st.session_state.get('authenticated'):
+        # Signed in, but the token could not be stored; keep this session only
+        return True
+
+    user = validate_session_token(token)
+    if not user:
+        for key in ['logged_in', 'authenticated', 'user_id', 'username', 'session_token']:
+            if key in st.session_state:
+                del st.session_state[key]
+        # Expire a stale cookie once per session
+        if cookie_token and not st.session_state.get('session_cookie_cleared'):
+            st.session_state.session_cookie_cleared = True
+            _write_session_cookie(None)
+        return False
+
+    if not st.session_state.get('authenticated'):
+        _set_session_state(user, token)
+    if st.session_state.pop('session_cookie_pending', False):
+        _write_session_cookie(token)
+    return True
+
+def end_session():
+    """Sign out and revoke the current session token; restore_session then expires the cookie"""
+    revoke_session_token(st.session_state.get('session_token') or (getattr(st.context, 'cookies', None) or {}).get(SESSION_COOKIE))
 
 def check_authentication_status():
     """Check if user is authenticated"""
-    return st.session_state.get('authenticated', False)
+    return restore_session()
 
 def require_authentication():
-    """Decorator to require authentication for pages"""
+    """Stop the page with a link back to login unless the user is authenticated"""
     if not check_authentication_status():
         st.error("Please login to access this page")
+        if st.button("← Back to Login"):
+            st.switch_page("main.py")
         st.stop()
 
 def get_current_user_id():
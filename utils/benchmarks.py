@@ -0,0 +1,97 @@
+import bisect
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from utils.database import refresh_score_benchmarks, get_score_benchmarks
+
+# How often the stored histograms are rebuilt from the sessions table
+BENCHMARK_REFRESH_SECONDS = 15 * 60
+
+# Fewer peer sessions than this and a percentile would be misleading
+BENCHMARK_MIN_SAMPLES = 10
+
+# {(job_role, experience_level): (sorted distinct scores, cumulative counts, total)}
+_distributions = {}
+_loaded_at = None
+_refreshed_at = None
+_lock = threading.Lock()
+_refreshing = threading.Event()
+
+def _build_distributions(histograms: Dict) -> Dict:
+    """Turn {score: count} histograms into sorted scores with cumulative counts for bisection"""
+    distributions = {}
+    for key, histogram in histograms.items():
+        scores = sorted(histogram)
+        cumulative = []
+        running = 0
+        for score in scores:
+            running += histogram[score]
+            cumulative.append(running)
+        distributions[key] = (scores, cumulative, running)
+    return distributions
+
+def _refresh_in_background():
+    """Rebuild the stored histograms, then reload the in-memory distributions"""
+    global _distributions, _loaded_at, _refreshed_at
+    try:
+        refresh_score_benchmarks()
+        distributions = _build_distributions(get_score_benchmarks())
+        with _lock:
+            _distributions = distributions
+            _loaded_at = _refreshed_at = time.monotonic()
+    finally:
+        _refreshing.clear()
+
+def _ensure_fresh():
+    """Load distributions on first use and schedule a rebuild once they are stale; never blocks on a rebuild"""
+    global _distributions, _loaded_at
+    now = time.monotonic()
+
+    if _loaded_at is None:
+        distributions = _build_distributions(get_score_benchmarks())
+        with _lock:
+            if _loaded_at is None:
+                _distributions = distributions
+                _loaded_at = now
+
+    stale = _refreshed_at is None or now - _refreshed_at >= BENCHMARK_REFRESH_SECONDS
+    if stale and not _refreshing.is_set():
+        _refreshing.set()
+        threading.Thread(target=_refresh_in_background, name="echoprep-benchmarks", daemon=True).start()
+
+def percent_below(below, total):
+    """The percentile shown to users: share of peer sessions scoring strictly below, in whole percent
+
+    Works on plain numbers and on pandas Series alike, so cohort reports (utils.analytics)
+    use the same definition as the report page.
+    """
+    return round(100 * below / total)
+
+def get_score_percentile(job_role: str, experience_level: str, score: float) -> Optional[Dict]:
+    """Share of peer sessions (same role and level) that scored strictly below score
+
+    Uses a binary search over the cached cumulative distribution. Returns None
+    when there are too few peers to compare against.
+    """
+    _ensure_fresh()
+    with _lock:
+        distribution = _distributions.get((job_role, experience_level))
+    if not distribution:
+        return None
+
+    scores, cumulative, total = distribution
+    if total < BENCHMARK_MIN_SAMPLES:
+        return None
+
+    position = bisect.bisect_left(scores, score)
+    below = cumulative[position - 1] if position else 0
+    return {'percentile': percent_below(below, total), 'sample_count': total}
+
+def describe_peer_group(job_role: str, experience_level: str) -> str:
+    """Readable peer group such as 'Mid Level Data Analysts'"""
+    level = re.sub(r"\s*\(.*?\)", "", experience_level or "").strip()
+    role = (job_role or "").strip()
+    plural = role if role.endswith('s') else f"{role}s"
+    return f"{level} {plural}".strip()
@@ -0,0 +1,128 @@
+"""Background completion of finished interviews: save the answers, analyze them, store the feedback.
+
+Jobs live in the completion_jobs table, so a job queued before a browser refresh or a server
+restart is still picked up. One worker thread per server process works through the queue; a job
+whose worker died while running is taken over once it has not been updated for
+COMPLETION_STALE_SECONDS.
+"""
+import json
+import threading
+
+from utils.database import (
+    enqueue_completion_job,
+    claim_completion_job,
+    update_completion_job,
+    get_latest_completion_job,
+    complete_interview_with_responses,
+    create_interview_session,
+    get_interview_mock
+)
+from utils.ai_services import analyze_interview_performance
+from utils.speech_metrics import summarize_speech_metrics, format_speech_metrics
+
+# How often the idle worker looks for jobs queued by other processes
+COMPLETION_POLL_SECONDS = 5
+
+# Running jobs not updated for this long belong to a worker that died
+COMPLETION_STALE_SECONDS = 600
+
+# Attempts before a job is marked failed
+COMPLETION_MAX_ATTEMPTS = 3
+
+# Progress shown on the report page for each stage
+COMPLETION_STAGES = {
+    'queued': (0.1, "Waiting to start..."),
+    'saving': (0.3, "Saving your answers..."),
+    'analyzing': (0.6, "Analyzing your performance..."),
+    'done': (1.0, "Analysis complete")
+}
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+def build_transcript(responses):
+    """Q/A transcript text of an interview's answers"""
+    return "".join(f"Q: {response['question']}\nA: {response['response']}\n\n" for response in responses)
+
+def _run_job(job):
+    """Save a job's answers, then analyze them and store the feedback"""
+    interview_id = job['interview_id']
+    responses = job['responses']
+
+    update_completion_job(job['id'], stage='saving')
+    complete_interview_with_responses(interview_id, responses)
+
+    update_completion_job(job['id'], stage='analyzing')
+    interview = get_interview_mock(interview_id)
+    if not interview:
+        raise RuntimeError(f"Interview {interview_id} not found")
+
+    transcript = build_transcript(responses)
+    analysis = analyze_interview_performance(
+        transcript=transcript,
+        job_role=interview['job_role'],
+        experience_level=interview['experience_level'],
+        skills=interview['skills'],
+        speech_metrics=format_speech_metrics(summarize_speech_metrics(responses)),
+        # Failures raise, so the job is retried instead of storing placeholder scores
+        raise_on_error=True
+    )
+    session_id = create_interview_session(
+        mock_id=interview_id,
+        transcript=transcript,
+        feedback=json.dumps(analysis),
+        # Sample feedback (no API key configured) is stored ungraded
+        score=analysis.get('overall_score', 0) if analysis.get('analyzed', True) else None
+    )
+    if session_id is None:
+        raise RuntimeError("Could not store the analysis")
+
+    update_completion_job(job['id'], status='done', stage='done')
+
+def _work():
+    """Worker loop: run queued jobs until there are none, then wait for a wakeup or the poll interval"""
+    while True:
+        job = claim_completion_job(COMPLETION_STALE_SECONDS)
+        if job is None:
+            _wakeup.wait(COMPLETION_POLL_SECONDS)
+            _wakeup.clear()
+            continue
+
+        try:
+            _run_job(job)
+        except Exception as e:
+            print(f"❌ Error completing interview {job['interview_id']}: {e}")
+            retry = job['attempts'] < COMPLETION_MAX_ATTEMPTS
+            update_completion_job(job['id'], status='queued' if retry else 'failed', error=str(e))
+
+def start_completion_worker():
+    """Start this process's worker thread if it is not running yet"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name="echoprep-completion", daemon=True)
+            _worker.start()
+
+def submit_interview_completion(interview_id, responses):
+    """Queue a finished interview for saving and analysis and return the job id without waiting"""
+    job_id = enqueue_completion_job(interview_id, responses)
+    start_completion_worker()
+    _wakeup.set()
+    return job_id
+
+def get_completion_status(interview_id):
+    """Latest completion job of an interview with its progress fraction and label, or None
+
+    Also makes sure a worker is running, so jobs queued before a server restart resume
+    as soon as someone opens their report.
+    """
+    job = get_latest_completion_job(interview_id)
+    if job is None:
+        return None
+    if job['status'] in ('queued', 'running'):
+        start_completion_worker()
+
+    stage = 'queued' if job['status'] == 'queued' else job['stage'] or 'queued'
+    job['progress'], job['label'] = COMPLETION_STAGES.get(stage, COMPLETION_STAGES['queued'])
+    return job
@@ -1,8 +1,58 @@
 import sqlite3
+import base64
 import hashlib
+import hmac
+import json
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# scrypt cost parameters: n=2**14, r=8 uses 16 MiB of memory per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_SALT_BYTES = 16
+SCRYPT_KEY_BYTES = 32
+
+# Password hashing runs on a small dedicated pool so a burst of logins cannot
+# occupy every Streamlit script thread; waiting requests beyond the cap are refused
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+PASSWORD_HASH_WAIT_SECONDS = 5
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="echoprep-password")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+# In-process write version per interview, bumped whenever its questions, answers or analysis
+# change, so per-session read-through caches (utils/session_cache.py) know when to reload
+_interview_versions = {}
+_interview_versions_lock = threading.Lock()
+
+# Searchable text of a feedback JSON document: its string values, without the keys
+FEEDBACK_SEARCH_TEXT = "(SELECT group_concat(value, ' ') FROM json_tree({row}.feedback) WHERE type = 'text')"
+
+# answer_search column weights for bm25 (interview_id, question, answer, feedback)
+SEARCH_COLUMN_WEIGHTS = (0.0, 1.0, 2.0, 0.5)
+
+# Markers around matched terms in search snippets, replaced by the caller when rendering
+SEARCH_MATCH_START = "\x02"
+SEARCH_MATCH_END = "\x03"
+
+def get_interview_version(interview_id):
+    """Current write version of an interview in this process"""
+    with _interview_versions_lock:
+        return _interview_versions.get(interview_id, 0)
+
+def bump_interview_version(*interview_ids):
+    """Mark interviews as changed so cached copies are reloaded"""
+    with _interview_versions_lock:
+        for interview_id in interview_ids:
+            _interview_versions[interview_id] = _interview_versions.get(interview_id, 0) + 1
+
 def get_db_path():
     """Get the database file path"""
     return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'echoprep.db')
@@ -55,6 +105,169 @@ def init_database():
             )
         ''')
         
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_responses_interview_id ON responses (interview_id, id)")
+        
+        # Create interview_sessions table; feedback is minified JSON read field by field with json_extract
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS interview_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                interview_id INTEGER NOT NULL,
+                transcript TEXT,
+                feedback TEXT CHECK (feedback IS NULL OR json_valid(feedback)),
+                overall_score INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (interview_id) REFERENCES interviews (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_interview_sessions_interview_id ON interview_sessions (interview_id, id)")
+        
+        # Create progress tables, maintained incrementally whenever an analysis is stored
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_progress (
+                user_id INTEGER PRIMARY KEY,
+                interview_count INTEGER NOT NULL DEFAULT 0,
+                score_total INTEGER NOT NULL DEFAULT 0,
+                average_score REAL,
+                rolling_average REAL,
+                best_score INTEGER,
+                last_score INTEGER,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_dimension_progress (
+                user_id INTEGER NOT NULL,
+                dimension TEXT NOT NULL,
+                score_count INTEGER NOT NULL DEFAULT 0,
+                score_total INTEGER NOT NULL DEFAULT 0,
+                average_score REAL,
+                rolling_average REAL,
+                PRIMARY KEY (user_id, dimension),
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        
+        # Create score_benchmarks table: per role/level score histograms, rebuilt periodically
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS score_benchmarks (
+                job_role TEXT NOT NULL,
+                experience_level TEXT NOT NULL,
+                histogram TEXT NOT NULL,
+                sample_count INTEGER NOT NULL,
+                refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (job_role, experience_level)
+            )
+        ''')
+        
+        # Create sessions table (token hashes only, never the tokens themselves)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                token_hash TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+        
+        # Create question_vectors table: persisted entries of the per-user question similarity index
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS question_vectors (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                interview_id INTEGER NOT NULL,
+                encoder TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                FOREIGN KEY (interview_id) REFERENCES interviews (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_question_vectors_user ON question_vectors (user_id, encoder, interview_id)")
+
+        # Create completion_jobs table: durable queue of finished interviews waiting to be saved and analyzed
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS completion_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                interview_id INTEGER NOT NULL,
+                responses TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                stage TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                FOREIGN KEY (interview_id) REFERENCES interviews (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_completion_jobs_status ON completion_jobs (status, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_completion_jobs_interview_id ON completion_jobs (interview_id, id)")
+
+        # Create answer_search full-text index over answers and feedback, kept in sync by triggers.
+        # Responses use their own id as rowid and analyzed sessions the negated session id.
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'answer_search'")
+        search_index_exists = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS answer_search USING fts5 (
+                interview_id UNINDEXED,
+                question,
+                answer,
+                feedback,
+                tokenize = 'porter unicode61'
+            )
+        ''')
+        cursor.executescript(f'''
+            CREATE TRIGGER IF NOT EXISTS answer_search_response_insert AFTER INSERT ON responses BEGIN
+                INSERT INTO answer_search (rowid, interview_id, question, answer, feedback)
+                VALUES (NEW.id, NEW.interview_id, NEW.question, NEW.answer, NEW.ai_feedback);
+            END;
+            CREATE TRIGGER IF NOT EXISTS answer_search_response_delete AFTER DELETE ON responses BEGIN
+                DELETE FROM answer_search WHERE rowid = OLD.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS answer_search_response_update AFTER UPDATE OF question, answer, ai_feedback ON responses BEGIN
+                DELETE FROM answer_search WHERE rowid = OLD.id;
+                INSERT INTO answer_search (rowid, interview_id, question, answer, feedback)
+                VALUES (NEW.id, NEW.interview_id, NEW.question, NEW.answer, NEW.ai_feedback);
+            END;
+            CREATE TRIGGER IF NOT EXISTS answer_search_session_insert AFTER INSERT ON interview_sessions BEGIN
+                INSERT INTO answer_search (rowid, interview_id, feedback)
+                VALUES (-NEW.id, NEW.interview_id, {FEEDBACK_SEARCH_TEXT.format(row='NEW')});
+            END;
+            CREATE TRIGGER IF NOT EXISTS answer_search_session_delete AFTER DELETE ON interview_sessions BEGIN
+                DELETE FROM answer_search WHERE rowid = -OLD.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS answer_search_session_update AFTER UPDATE OF feedback ON interview_sessions BEGIN
+                DELETE FROM answer_search WHERE rowid = -OLD.id;
+                INSERT INTO answer_search (rowid, interview_id, feedback)
+                VALUES (-NEW.id, NEW.interview_id, {FEEDBACK_SEARCH_TEXT.format(row='NEW')});
+            END;
+        ''')
+        if not search_index_exists:
+            cursor.execute(
+                "INSERT INTO answer_search (rowid, interview_id, question, answer, feedback) "
+                "SELECT id, interview_id, question, answer, ai_feedback FROM responses"
+            )
+            cursor.execute(
+                "INSERT INTO answer_search (rowid, interview_id, feedback) "
+                f"SELECT -s.id, s.interview_id, {FEEDBACK_SEARCH_TEXT.format(row='s')} FROM interview_sessions s"
+            )
+        
+        # Add columns introduced after the initial schema
+        cursor.execute("PRAGMA table_info(interviews)")
+        interview_columns = [column[1] for column in cursor.fetchall()]
+        if 'questions' not in interview_columns:
+            cursor.execute("ALTER TABLE interviews ADD COLUMN questions TEXT")
+        
+        cursor.execute("PRAGMA table_info(responses)")
+        response_columns = [column[1] for column in cursor.fetchall()]
+        if 'audio_digest' not in response_columns:
+            cursor.execute("ALTER TABLE responses ADD COLUMN audio_digest TEXT")
+        if 'speech_metrics' not in response_columns:
+            cursor.execute("ALTER TABLE responses ADD COLUMN speech_metrics TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_responses_audio_digest ON responses (audio_digest) WHERE audio_digest IS NOT NULL")
+        
         conn.commit()
         conn.close()
         print("✅ Database initialized successfully")
@@ -64,30 +277,143 @@ def init_database():
         raise
 
 def hash_password(password):
-    """Hash a password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password with salted scrypt, returning 'scrypt$n$r$p$salt$key'"""
+    salt = os.urandom(SCRYPT_SALT_BYTES)
+    key = hashlib.scrypt(
+        password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+        maxmem=256 * SCRYPT_N * SCRYPT_R, dklen=SCRYPT_KEY_BYTES
+    )
+    return "scrypt${}${}${}${}${}".format(
+        SCRYPT_N, SCRYPT_R, SCRYPT_P,
+        base64.b64encode(salt).decode(), base64.b64encode(key).decode()
+    )
+
+def verify_password(password, password_hash):
+    """Check a password against a stored hash; returns (matches, needs_rehash)"""
+    if password_hash.startswith("scrypt$"):
+        _, n, r, p, salt, key = password_hash.split("$")
+        n, r, p = int(n), int(r), int(p)
+        expected = base64.b64decode(key)
+        candidate = hashlib.scrypt(
+            password.encode(), salt=base64.b64decode(salt), n=n, r=r, p=p,
+            maxmem=256 * n * r, dklen=len(expected)
+        )
+        matches = hmac.compare_digest(candidate, expected)
+        return matches, matches and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    
+    # Legacy unsalted SHA-256 hex digest
+    matches = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), password_hash)
+    return matches, matches
+
+class PasswordHasherBusy(RuntimeError):
+    """The password hashing pool stayed saturated for PASSWORD_HASH_WAIT_SECONDS"""
+
+def run_password_hasher(func, *args):
+    """Run a password hashing function on the dedicated pool, refusing work when it is saturated"""
+    if not _hash_slots.acquire(timeout=PASSWORD_HASH_WAIT_SECONDS):
+        raise PasswordHasherBusy("Password hashing is busy, please try again")
+    try:
+        return _hash_executor.submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+# Recently verified credentials, so repeat sign-ins skip the database and scrypt.
+# Entries hold an HMAC of the password under a per-process key, never the password itself.
+CREDENTIAL_CACHE_TTL = 300
+CREDENTIAL_CACHE_MAX_ENTRIES = 1024
+
+_credential_cache = OrderedDict()
+_credential_cache_lock = threading.Lock()
+_credential_cache_key = os.urandom(32)
+
+def _credential_fingerprint(username, password):
+    """Keyed digest identifying a username/password pair"""
+    return hmac.new(_credential_cache_key, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+
+def _get_cached_credentials(username, password):
+    """Return the cached user for a recently verified username/password pair, if any"""
+    with _credential_cache_lock:
+        entry = _credential_cache.get(username)
+        if not entry:
+            return None
+        fingerprint, user, expires_at = entry
+        if expires_at < time.monotonic():
+            del _credential_cache[username]
+            return None
+        if not hmac.compare_digest(fingerprint, _credential_fingerprint(username, password)):
+            return None
+        _credential_cache.move_to_end(username)
+        return dict(user)
+
+def _cache_credentials(username, password, user):
+    """Remember a successful credential check for CREDENTIAL_CACHE_TTL seconds"""
+    with _credential_cache_lock:
+        _credential_cache[username] = (
+            _credential_fingerprint(username, password), dict(user), time.monotonic() + CREDENTIAL_CACHE_TTL
+        )
+        _credential_cache.move_to_end(username)
+        while len(_credential_cache) > CREDENTIAL_CACHE_MAX_ENTRIES:
+            _credential_cache.popitem(last=False)
+
+# Stand-in hash verified for unknown usernames so they take as long as real ones; built on first use
+_dummy_password_hash = None
+_dummy_password_hash_lock = threading.Lock()
+
+def _get_dummy_password_hash():
+    """Return the stand-in hash, hashing it on the first failed lookup instead of at import"""
+    global _dummy_password_hash
+    with _dummy_password_hash_lock:
+        if _dummy_password_hash is None:
+            _dummy_password_hash = run_password_hasher(hash_password, "echoprep-dummy-password")
+        return _dummy_password_hash
 
 def verify_user(username, password):
-    """Verify user credentials"""
+    """Verify user credentials, upgrading legacy password hashes on success
+    
+    Raises PasswordHasherBusy when the credentials could not be checked, so callers can tell
+    an overloaded server from a wrong password.
+    """
+    cached_user = _get_cached_credentials(username, password)
+    if cached_user:
+        return cached_user
+    
     db_path = get_db_path()
     
     try:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        password_hash = hash_password(password)
         cursor.execute(
-            "SELECT id, username FROM users WHERE username = ? AND password_hash = ?",
-            (username, password_hash)
+            "SELECT id, username, password_hash FROM users WHERE username = ?",
+            (username,)
         )
-        
         user = cursor.fetchone()
         conn.close()
         
-        if user:
-            return {'id': user[0], 'username': user[1]}
-        return None
+        if not user:
+            run_password_hasher(verify_password, password, _get_dummy_password_hash())
+            return None
+        
+        matches, needs_rehash = run_password_hasher(verify_password, password, user[2])
+        if not matches:
+            return None
+        
+        if needs_rehash:
+            new_hash = run_password_hasher(hash_password, password)
+            conn = sqlite3.connect(db_path)
+            conn.execute(
+                "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                (new_hash, user[0], user[2])
+            )
+            conn.commit()
+            conn.close()
         
+        verified_user = {'id': user[0], 'username': user[1]}
+        _cache_credentials(username, password, verified_user)
+        return verified_user
+        
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         print(f"❌ User verification error: {e}")
         return None
@@ -97,10 +423,11 @@ def create_user(username, email, password):
     db_path = get_db_path()
     
     try:
+        password_hash = run_password_hasher(hash_password, password)
+        
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        password_hash = hash_password(password)
         cursor.execute(
             "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
             (username, email, password_hash)
@@ -124,8 +451,11 @@ def get_user_interviews(user_id):
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
+        # Latest score comes from the overall_score column, so no feedback JSON is read
         cursor.execute(
-            "SELECT * FROM interviews WHERE user_id = ? ORDER BY created_at DESC",
+            """SELECT i.id, i.user_id, i.job_role, i.experience_level, i.interview_type, i.skills, i.completed, i.created_at,
+                      (SELECT s.overall_score FROM interview_sessions s WHERE s.interview_id = i.id ORDER BY s.id DESC LIMIT 1)
+               FROM interviews i WHERE i.user_id = ? ORDER BY i.created_at DESC""",
             (user_id,)
         )
         
@@ -143,7 +473,8 @@ def get_user_interviews(user_id):
                 'interview_type': interview[4],
                 'skills': interview[5],
                 'completed': interview[6],
-                'created_at': interview[7]
+                'created_at': interview[7],
+                'overall_score': interview[8]
             })
         
         return interview_list
@@ -151,3 +482,887 @@ def get_user_interviews(user_id):
     except Exception as e:
         print(f"❌ Error fetching interviews: {e}")
         return []
+
+def create_interview_mock(user_id, job_role, experience_level, interview_type, skills, questions=None):
+    """Create a new mock interview, optionally with its generated questions"""
+    db_path = get_db_path()
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO interviews (user_id, job_role, experience_level, interview_type, skills, questions) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, job_role, experience_level, interview_type, skills,
+             json.dumps(questions) if questions is not None else None)
+        )
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+def update_interview_questions(interview_id, questions):
+    """Store the generated questions for an interview"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "UPDATE interviews SET questions = ? WHERE id = ?",
+            (json.dumps(questions), interview_id)
+        )
+        
+        conn.commit()
+        conn.close()
+        bump_interview_version(interview_id)
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error updating interview questions: {e}")
+        return False
+
+def get_interview_mock(interview_id):
+    """Get a single mock interview by ID"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT id, user_id, job_role, experience_level, interview_type, skills, completed, created_at, questions FROM interviews WHERE id = ?",
+            (interview_id,)
+        )
+        
+        interview = cursor.fetchone()
+        conn.close()
+        
+        if not interview:
+            return None
+        
+        return {
+            'id': interview[0],
+            'user_id': interview[1],
+            'job_role': interview[2],
+            'experience_level': interview[3],
+            'interview_type': interview[4],
+            'skills': interview[5],
+            'completed': interview[6],
+            'created_at': interview[7],
+            'questions': interview[8] or '[]'
+        }
+        
+    except Exception as e:
+        print(f"❌ Error fetching interview: {e}")
+        return None
+
+def create_cohort_interviews(entries):
+    """Create users (when missing) and interviews for a whole cohort in a single transaction
+    
+    Each entry is a dict with username, job_role, experience_level, interview_type and skills;
+    email and password are only needed for users that don't exist yet. Returns the new
+    interview IDs in entry order. Nothing is written if any entry fails.
+    """
+    db_path = get_db_path()
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        # Hash new users' passwords before the transaction so scrypt never runs under the write lock
+        usernames = list({entry['username'] for entry in entries})
+        existing = set()
+        for start in range(0, len(usernames), 500):
+            chunk = usernames[start:start + 500]
+            cursor = conn.execute(
+                f"SELECT username FROM users WHERE username IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+        
+        new_users = {}
+        for entry in entries:
+            username = entry['username']
+            if username not in existing and username not in new_users and entry.get('email') and entry.get('password'):
+                new_users[username] = (entry['email'], run_password_hasher(hash_password, entry['password']))
+        
+        with conn:
+            cursor = conn.cursor()
+            user_ids = {}
+            interview_ids = []
+            
+            for entry in entries:
+                username = entry['username']
+                if username not in user_ids:
+                    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+                    user = cursor.fetchone()
+                    if user:
+                        user_ids[username] = user[0]
+                    elif username in new_users:
+                        cursor.execute(
+                            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                            (username, *new_users[username])
+                        )
+                        user_ids[username] = cursor.lastrowid
+                    else:
+                        raise ValueError(f"User '{username}' does not exist and no email/password was given to create it")
+                
+                cursor.execute(
+                    "INSERT INTO interviews (user_id, job_role, experience_level, interview_type, skills) VALUES (?, ?, ?, ?, ?)",
+                    (user_ids[username], entry['job_role'], entry['experience_level'],
+                     entry['interview_type'], entry.get('skills', ''))
+                )
+                interview_ids.append(cursor.lastrowid)
+        
+        return interview_ids
+    finally:
+        conn.close()
+
+def update_interview_questions_bulk(questions_by_interview):
+    """Store generated questions for many interviews in one transaction"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.executemany(
+                "UPDATE interviews SET questions = ? WHERE id = ?",
+                [(json.dumps(questions), interview_id) for interview_id, questions in questions_by_interview.items()]
+            )
+        conn.close()
+        bump_interview_version(*questions_by_interview)
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error updating interview questions: {e}")
+        return False
+
+def create_session_record(token_hash, user_id, expires_at):
+    """Store a new login session, pruning expired ones"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+            conn.execute(
+                "INSERT INTO sessions (token_hash, user_id, expires_at) VALUES (?, ?, ?)",
+                (token_hash, user_id, expires_at)
+            )
+        conn.close()
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error creating session: {e}")
+        return False
+
+def get_session_record(token_hash):
+    """Get the user for an unexpired session"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """SELECT s.user_id, u.username, s.expires_at FROM sessions s
+               JOIN users u ON u.id = s.user_id
+               WHERE s.token_hash = ? AND s.expires_at >= ?""",
+            (token_hash, time.time())
+        )
+        
+        session = cursor.fetchone()
+        conn.close()
+        
+        if session:
+            return {'id': session[0], 'username': session[1], 'expires_at': session[2]}
+        return None
+        
+    except Exception as e:
+        print(f"❌ Error fetching session: {e}")
+        return None
+
+def delete_session_record(token_hash):
+    """Revoke a login session"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE token_hash = ?", (token_hash,))
+        conn.close()
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error deleting session: {e}")
+        return False
+
+def complete_interview_with_responses(interview_id, responses):
+    """Store one row per answer and mark the interview completed, replacing any earlier attempt"""
+    db_path = get_db_path()
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM responses WHERE interview_id = ?", (interview_id,))
+            conn.executemany(
+                "INSERT INTO responses (interview_id, question, answer, ai_feedback, score, audio_digest, speech_metrics) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (interview_id, response['question'], response['response'],
+                     response.get('ai_feedback'), response.get('score'), response.get('audio_digest'),
+                     json.dumps(response['speech_metrics']) if response.get('speech_metrics') else None)
+                    for response in responses
+                ]
+            )
+            conn.execute("UPDATE interviews SET completed = TRUE WHERE id = ?", (interview_id,))
+        bump_interview_version(interview_id)
+        return True
+    finally:
+        conn.close()
+
+def get_interview_responses(interview_id):
+    """Get the stored answers for an interview in the order they were given"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT id, question, answer, score, ai_feedback, created_at, audio_digest, speech_metrics FROM responses WHERE interview_id = ? ORDER BY id",
+            (interview_id,)
+        )
+        
+        responses = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'id': response[0],
+                'question': response[1],
+                'answer': response[2],
+                'score': response[3],
+                'ai_feedback': response[4],
+                'created_at': response[5],
+                'audio_digest': response[6],
+                'speech_metrics': json.loads(response[7]) if response[7] else None
+            }
+            for response in responses
+        ]
+        
+    except Exception as e:
+        print(f"❌ Error fetching responses: {e}")
+        return []
+
+def get_expired_audio_digests(retention_days):
+    """Get archived recording digests whose newest referencing answer is older than retention_days"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """SELECT audio_digest FROM responses WHERE audio_digest IS NOT NULL
+               GROUP BY audio_digest HAVING MAX(created_at) < datetime('now', ?)""",
+            (f"-{int(retention_days)} days",)
+        )
+        digests = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        
+        return digests
+        
+    except Exception as e:
+        print(f"❌ Error fetching expired recordings: {e}")
+        return []
+
+def clear_audio_digests(digests):
+    """Detach deleted recordings from their answers"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.executemany(
+                "UPDATE responses SET audio_digest = NULL WHERE audio_digest = ?",
+                [(digest,) for digest in digests]
+            )
+        conn.close()
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error clearing recordings: {e}")
+        return False
+
+def get_referenced_audio_digests():
+    """Get the set of recording digests still referenced by any answer"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT DISTINCT audio_digest FROM responses WHERE audio_digest IS NOT NULL")
+        digests = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        
+        return digests
+        
+    except Exception as e:
+        print(f"❌ Error fetching referenced recordings: {e}")
+        return None
+
+def encode_feedback(feedback):
+    """Minified JSON for a feedback dict or JSON string"""
+    if isinstance(feedback, str):
+        feedback = json.loads(feedback)
+    return json.dumps(feedback, separators=(',', ':'), ensure_ascii=False)
+
+# Weight of the newest score in the rolling (exponential moving) averages
+PROGRESS_ROLLING_WEIGHT = 0.3
+
+# Per-dimension scores tracked in user_dimension_progress
+PROGRESS_DIMENSIONS = ['clarity', 'technical_accuracy', 'problem_solving', 'confidence']
+
+def _update_user_progress(cursor, user_id, score, detailed_scores):
+    """Fold one analysis into the user's progress aggregates (runs inside the caller's transaction)"""
+    weight = PROGRESS_ROLLING_WEIGHT
+    cursor.execute(
+        """INSERT INTO user_progress (user_id, interview_count, score_total, average_score, rolling_average, best_score, last_score)
+           VALUES (?, 1, ?, ?, ?, ?, ?)
+           ON CONFLICT (user_id) DO UPDATE SET
+               interview_count = interview_count + 1,
+               score_total = score_total + excluded.score_total,
+               average_score = CAST(score_total + excluded.score_total AS REAL) / (interview_count + 1),
+               rolling_average = ? * excluded.last_score + (1 - ?) * rolling_average,
+               best_score = MAX(best_score, excluded.best_score),
+               last_score = excluded.last_score,
+               updated_at = CURRENT_TIMESTAMP""",
+        (user_id, score, score, score, score, score, weight, weight)
+    )
+    
+    for dimension in PROGRESS_DIMENSIONS:
+        value = (detailed_scores or {}).get(dimension)
+        if not isinstance(value, (int, float)):
+            continue
+        cursor.execute(
+            """INSERT INTO user_dimension_progress (user_id, dimension, score_count, score_total, average_score, rolling_average)
+               VALUES (?, ?, 1, ?, ?, ?)
+               ON CONFLICT (user_id, dimension) DO UPDATE SET
+                   score_count = score_count + 1,
+                   score_total = score_total + excluded.score_total,
+                   average_score = CAST(score_total + excluded.score_total AS REAL) / (score_count + 1),
+                   rolling_average = ? * excluded.score_total + (1 - ?) * rolling_average""",
+            (user_id, dimension, value, value, value, weight, weight)
+        )
+
+# Clarity feedback of the placeholder analyses stored before they carried "analyzed": false
+PLACEHOLDER_CLARITY_FEEDBACK = (
+    "Good communication skills demonstrated throughout the interview.",
+    "Analysis completed - please review the detailed feedback below.",
+    "Unable to analyze due to technical issues."
+)
+
+# SQL condition on interview_sessions (aliased s) that drops placeholder analyses;
+# bind PLACEHOLDER_CLARITY_FEEDBACK to its parameters
+REAL_ANALYSIS_CONDITION = (
+    "CASE WHEN json_valid(s.feedback) THEN "
+    "COALESCE(json_extract(s.feedback, '$.analyzed'), 1) != 0 "
+    "AND COALESCE(json_extract(s.feedback, '$.feedback.clarity'), '') NOT IN ({}) "
+    "ELSE 1 END"
+).format(", ".join("?" * len(PLACEHOLDER_CLARITY_FEEDBACK)))
+
+def is_placeholder_analysis(feedback):
+    """Whether a feedback dict is placeholder text rather than a real analysis"""
+    if feedback.get('analyzed') is False:
+        return True
+    return (feedback.get('feedback') or {}).get('clarity') in PLACEHOLDER_CLARITY_FEEDBACK
+
+def create_interview_session(mock_id, transcript, feedback, score):
+    """Store a completed interview session with its AI feedback and update the user's progress
+    
+    Placeholder analyses are stored without a score and left out of the progress aggregates.
+    """
+    db_path = get_db_path()
+    
+    try:
+        feedback_json = encode_feedback(feedback)
+        analysis = json.loads(feedback_json)
+        detailed_scores = analysis.get('detailed_scores')
+        if is_placeholder_analysis(analysis):
+            score = None
+        
+        conn = sqlite3.connect(db_path)
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO interview_sessions (interview_id, transcript, feedback, overall_score) VALUES (?, ?, ?, ?)",
+                (mock_id, transcript, feedback_json, score)
+            )
+            session_id = cursor.lastrowid
+            
+            cursor.execute("SELECT user_id FROM interviews WHERE id = ?", (mock_id,))
+            interview = cursor.fetchone()
+            if interview and score is not None:
+                _update_user_progress(cursor, interview[0], score, detailed_scores)
+        conn.close()
+        bump_interview_version(mock_id)
+        return session_id
+        
+    except Exception as e:
+        print(f"❌ Error creating interview session: {e}")
+        return None
+
+def get_interview_session(interview_id):
+    """Get the latest session for an interview, including the full feedback JSON"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT id, interview_id, transcript, feedback, overall_score, created_at FROM interview_sessions WHERE interview_id = ? ORDER BY id DESC LIMIT 1",
+            (interview_id,)
+        )
+        
+        session = cursor.fetchone()
+        conn.close()
+        
+        if not session:
+            return None
+        
+        return {
+            'id': session[0],
+            'interview_id': session[1],
+            'transcript': session[2],
+            'feedback': session[3],
+            'overall_score': session[4],
+            'created_at': session[5]
+        }
+        
+    except Exception as e:
+        print(f"❌ Error fetching interview session: {e}")
+        return None
+
+def get_feedback_fields(interview_id, *fields):
+    """Read selected top-level feedback fields of the latest session without loading the whole document
+    
+    Each field is pulled with json_extract; only the returned values are decoded.
+    Missing fields map to None. Returns None when the interview has no session.
+    """
+    db_path = get_db_path()
+    
+    # json_quote(json_extract()) returns every value as JSON text, so strings and objects decode alike
+    columns = ", ".join("json_quote(json_extract(feedback, ?))" for _ in fields)
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"SELECT {columns or '1'} FROM interview_sessions WHERE interview_id = ? AND feedback IS NOT NULL ORDER BY id DESC LIMIT 1",
+            [f'$."{field}"' for field in fields] + [interview_id]
+        )
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        if not row:
+            return None
+        
+        return {
+            field: json.loads(value) if value is not None else None
+            for field, value in zip(fields, row)
+        }
+        
+    except Exception as e:
+        print(f"❌ Error fetching feedback fields: {e}")
+        return None
+
+def _completion_job_row(row):
+    return {
+        'id': row[0],
+        'interview_id': row[1],
+        'status': row[2],
+        'stage': row[3],
+        'attempts': row[4],
+        'error': row[5],
+        'created_at': row[6],
+        'updated_at': row[7]
+    }
+
+def enqueue_completion_job(interview_id, responses):
+    """Queue a finished interview's answers for saving and analysis; returns the job id"""
+    db_path = get_db_path()
+
+    try:
+        now = time.time()
+        conn = sqlite3.connect(db_path)
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO completion_jobs (interview_id, responses, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (interview_id, json.dumps(responses), now, now)
+            )
+            job_id = cursor.lastrowid
+        conn.close()
+        return job_id
+
+    except Exception as e:
+        print(f"❌ Error queuing interview completion: {e}")
+        return None
+
+def claim_completion_job(stale_seconds):
+    """Take the oldest queued job, or a running one not updated for stale_seconds (its worker died)
+
+    The job is marked running in the same write transaction, so two workers never claim the
+    same job. Returns the job with its decoded answers, or None when there is nothing to do.
+    """
+    db_path = get_db_path()
+
+    try:
+        now = time.time()
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """SELECT id, interview_id, status, stage, attempts, error, created_at, updated_at, responses
+                   FROM completion_jobs
+                   WHERE status = 'queued' OR (status = 'running' AND updated_at < ?)
+                   ORDER BY id LIMIT 1""",
+                (now - stale_seconds,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE completion_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (now, row[0])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        if not row:
+            return None
+        job = _completion_job_row(row)
+        job.update(status='running', attempts=row[4] + 1, updated_at=now, responses=json.loads(row[8]))
+        return job
+
+    except Exception as e:
+        print(f"❌ Error claiming completion job: {e}")
+        return None
+
+def update_completion_job(job_id, status=None, stage=None, error=None):
+    """Record a job's progress; also serves as the running worker's heartbeat"""
+    db_path = get_db_path()
+
+    try:
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute(
+                """UPDATE completion_jobs SET status = COALESCE(?, status), stage = COALESCE(?, stage),
+                   error = ?, updated_at = ? WHERE id = ?""",
+                (status, stage, error, time.time(), job_id)
+            )
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Error updating completion job: {e}")
+        return False
+
+def requeue_completion_job(job_id):
+    """Put a failed job back in the queue with a fresh attempt budget"""
+    db_path = get_db_path()
+
+    try:
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute(
+                "UPDATE completion_jobs SET status = 'queued', attempts = 0, error = NULL, updated_at = ? WHERE id = ? AND status = 'failed'",
+                (time.time(), job_id)
+            )
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Error requeuing completion job: {e}")
+        return False
+
+def get_latest_completion_job(interview_id):
+    """Status of the newest completion job for an interview, or None when it never had one"""
+    db_path = get_db_path()
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """SELECT id, interview_id, status, stage, attempts, error, created_at, updated_at
+               FROM completion_jobs WHERE interview_id = ? ORDER BY id DESC LIMIT 1""",
+            (interview_id,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+
+        return _completion_job_row(row) if row else None
+
+    except Exception as e:
+        print(f"❌ Error fetching completion job: {e}")
+        return None
+
+def get_user_score_history(user_id):
+    """Overall scores of a user's analyzed sessions, oldest first, without placeholder analyses"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """SELECT s.interview_id, s.overall_score, s.created_at FROM interview_sessions s
+               JOIN interviews i ON i.id = s.interview_id
+               WHERE i.user_id = ? AND s.overall_score IS NOT NULL AND {} ORDER BY s.id""".format(REAL_ANALYSIS_CONDITION),
+            (user_id,) + PLACEHOLDER_CLARITY_FEEDBACK
+        )
+        
+        history = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {'interview_id': entry[0], 'overall_score': entry[1], 'created_at': entry[2]}
+            for entry in history
+        ]
+        
+    except Exception as e:
+        print(f"❌ Error fetching score history: {e}")
+        return []
+
+def get_user_progress(user_id):
+    """Get a user's precomputed progress summary and per-dimension averages"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT interview_count, average_score, rolling_average, best_score, last_score, updated_at FROM user_progress WHERE user_id = ?",
+            (user_id,)
+        )
+        progress = cursor.fetchone()
+        
+        cursor.execute(
+            "SELECT dimension, score_count, average_score, rolling_average FROM user_dimension_progress WHERE user_id = ?",
+            (user_id,)
+        )
+        dimensions = cursor.fetchall()
+        conn.close()
+        
+        if not progress:
+            return None
+        
+        return {
+            'interview_count': progress[0],
+            'average_score': progress[1],
+            'rolling_average': progress[2],
+            'best_score': progress[3],
+            'last_score': progress[4],
+            'updated_at': progress[5],
+            'dimensions': {
+                dimension[0]: {'count': dimension[1], 'average_score': dimension[2], 'rolling_average': dimension[3]}
+                for dimension in dimensions
+            }
+        }
+        
+    except Exception as e:
+        print(f"❌ Error fetching user progress: {e}")
+        return None
+
+def refresh_score_benchmarks():
+    """Rebuild the per role/level score histograms from all analyzed sessions, skipping placeholder analyses"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """SELECT i.job_role, i.experience_level, s.overall_score, COUNT(*)
+               FROM interview_sessions s JOIN interviews i ON i.id = s.interview_id
+               WHERE s.overall_score IS NOT NULL AND {}
+               GROUP BY i.job_role, i.experience_level, s.overall_score""".format(REAL_ANALYSIS_CONDITION),
+            PLACEHOLDER_CLARITY_FEEDBACK
+        )
+        
+        histograms = {}
+        for job_role, experience_level, score, count in cursor.fetchall():
+            histograms.setdefault((job_role, experience_level), {})[int(score)] = count
+        
+        with conn:
+            conn.execute("DELETE FROM score_benchmarks")
+            conn.executemany(
+                "INSERT INTO score_benchmarks (job_role, experience_level, histogram, sample_count) VALUES (?, ?, ?, ?)",
+                [
+                    (job_role, experience_level, json.dumps(histogram), sum(histogram.values()))
+                    for (job_role, experience_level), histogram in histograms.items()
+                ]
+            )
+        conn.close()
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error refreshing score benchmarks: {e}")
+        return False
+
+def get_score_benchmarks():
+    """Get every stored histogram as {(job_role, experience_level): {score: count}}"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT job_role, experience_level, histogram FROM score_benchmarks")
+        benchmarks = cursor.fetchall()
+        conn.close()
+        
+        return {
+            (job_role, experience_level): {int(score): count for score, count in json.loads(histogram).items()}
+            for job_role, experience_level, histogram in benchmarks
+        }
+        
+    except Exception as e:
+        print(f"❌ Error fetching score benchmarks: {e}")
+        return {}
+
+def get_question_vectors(user_id, encoder):
+    """Get a user's indexed questions for one encoder as (interview_id, question, vector) rows"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT interview_id, question, vector FROM question_vectors WHERE user_id = ? AND encoder = ? ORDER BY id",
+            (user_id, encoder)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return rows
+        
+    except Exception as e:
+        print(f"❌ Error fetching question vectors: {e}")
+        return []
+
+def get_unindexed_interview_questions(user_id, encoder):
+    """Get questions of a user's interviews that have no vectors for this encoder yet, as {interview_id: [questions]}"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """SELECT i.id, i.questions FROM interviews i
+               WHERE i.user_id = ? AND i.questions IS NOT NULL
+                 AND NOT EXISTS (SELECT 1 FROM question_vectors v
+                                 WHERE v.user_id = i.user_id AND v.encoder = ? AND v.interview_id = i.id)
+               ORDER BY i.id""",
+            (user_id, encoder)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+        
+        unindexed = {}
+        for interview_id, questions in rows:
+            try:
+                questions = json.loads(questions)
+            except (TypeError, ValueError):
+                continue
+            questions = [str(question) for question in questions if str(question).strip()]
+            if questions:
+                unindexed[interview_id] = questions
+        return unindexed
+        
+    except Exception as e:
+        print(f"❌ Error fetching unindexed questions: {e}")
+        return {}
+
+def add_question_vectors(user_id, encoder, rows):
+    """Append (interview_id, question, vector) rows to a user's question index"""
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.executemany(
+                "INSERT INTO question_vectors (user_id, interview_id, encoder, question, vector) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, interview_id, encoder, question, vector) for interview_id, question, vector in rows]
+            )
+        conn.close()
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error storing question vectors: {e}")
+        return False
+
+def _fts_query(text):
+    """FTS5 query for free text: every word must match, the last one as a prefix"""
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+def search_user_answers(user_id, text, limit=20):
+    """Full-text search over a user's answers and feedback, best bm25 matches first
+    
+    Snippets mark matched terms with SEARCH_MATCH_START and SEARCH_MATCH_END.
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    
+    db_path = get_db_path()
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        weights = ', '.join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+        cursor.execute(
+            f"""SELECT a.rowid, i.id, i.job_role, i.experience_level, i.created_at, a.question,
+                       snippet(answer_search, -1, ?, ?, '…', 16), bm25(answer_search, {weights}) AS rank
+                FROM answer_search a
+                JOIN interviews i ON i.id = a.interview_id
+                WHERE answer_search MATCH ? AND i.user_id = ?
+                ORDER BY rank
+                LIMIT ?""",
+            (SEARCH_MATCH_START, SEARCH_MATCH_END, query, user_id, limit)
+        )
+        
+        results = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'kind': 'response' if result[0] > 0 else 'feedback',
+                'interview_id': result[1],
+                'job_role': result[2],
+                'experience_level': result[3],
+                'created_at': result[4],
+                'question': result[5],
+                'snippet': result[6],
+                'rank': result[7]
+            }
+            for result in results
+        ]
+        
+    except Exception as e:
+        print(f"❌ Error searching answers: {e}")
+        return []
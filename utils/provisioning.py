@@ -0,0 +1,143 @@
+"""Bulk provisioning of mock interviews for a cohort of users.
+
+Python API:
+    from utils.provisioning import provision_cohort
+    report = provision_cohort("cohort.csv", max_workers=8)
+
+CLI:
+    python -m utils.provisioning cohort.csv --workers 8
+
+The CSV needs the columns username, job_role, experience_level and interview_type, and may
+include skills and duration. email and password are only used to create users that don't
+exist yet.
+"""
+import argparse
+import csv
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.ai_services import generate_interview_question_batch, questions_for_duration, QUESTION_BATCH_SIZE
+from utils.database import init_database, create_cohort_interviews, update_interview_questions_bulk
+
+REQUIRED_COLUMNS = ['username', 'job_role', 'experience_level', 'interview_type']
+
+# Concurrent Gemini batch requests; each request covers QUESTION_BATCH_SIZE interviews
+DEFAULT_WORKERS = 8
+
+def load_cohort_csv(csv_path: str) -> List[Dict]:
+    """Read and validate cohort rows from a CSV file"""
+    with open(csv_path, newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.DictReader(csv_file)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+        entries = []
+        for line_number, row in enumerate(reader, start=2):
+            entry = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            empty = [column for column in REQUIRED_COLUMNS if not entry.get(column)]
+            if empty:
+                raise ValueError(f"Line {line_number}: empty value for {', '.join(empty)}")
+            entries.append(entry)
+
+    return entries
+
+def provision_cohort(csv_path: str, max_workers: int = DEFAULT_WORKERS, batch_size: int = QUESTION_BATCH_SIZE) -> Dict:
+    """Create every interview in a cohort CSV and generate its questions
+
+    Users and interviews are created in a single transaction. Questions are then generated in
+    batches of batch_size interviews per model call across at most max_workers threads, and each
+    finished batch is written back as it completes. Returns counts, timings and throughput.
+    """
+    started = time.perf_counter()
+
+    init_database()
+    entries = load_cohort_csv(csv_path)
+    if not entries:
+        return {'interviews': 0, 'questions': 0, 'failed_batches': 0, 'create_seconds': 0.0,
+                'generate_seconds': 0.0, 'total_seconds': 0.0, 'interviews_per_second': 0.0}
+
+    interview_ids = create_cohort_interviews(entries)
+    created = time.perf_counter()
+
+    configs = []
+    for entry in entries:
+        configs.append({
+            'job_role': entry['job_role'],
+            'experience_level': entry['experience_level'],
+            'interview_type': entry['interview_type'],
+            'skills': entry.get('skills', ''),
+            'num_questions': questions_for_duration(entry.get('duration') or None)
+        })
+
+    batches = [
+        (interview_ids[start:start + batch_size], configs[start:start + batch_size])
+        for start in range(0, len(configs), batch_size)
+    ]
+
+    question_count = 0
+    failed_batches = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="echoprep-provision") as executor:
+        futures = {
+            executor.submit(generate_interview_question_batch, batch_configs): batch_ids
+            for batch_ids, batch_configs in batches
+        }
+
+        # SQLite writes stay on this thread; workers only call the model
+        for future in as_completed(futures):
+            batch_ids = futures[future]
+            try:
+                question_sets = future.result()
+            except Exception as e:
+                print(f"❌ Question generation failed for interviews {batch_ids[0]}-{batch_ids[-1]}: {e}")
+                failed_batches += 1
+                continue
+
+            if update_interview_questions_bulk(dict(zip(batch_ids, question_sets))):
+                question_count += sum(len(questions) for questions in question_sets)
+            else:
+                failed_batches += 1
+
+    finished = time.perf_counter()
+    total_seconds = finished - started
+
+    return {
+        'interviews': len(interview_ids),
+        'questions': question_count,
+        'failed_batches': failed_batches,
+        'create_seconds': created - started,
+        'generate_seconds': finished - created,
+        'total_seconds': total_seconds,
+        'interviews_per_second': len(interview_ids) / total_seconds if total_seconds else 0.0
+    }
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Provision EchoPrep mock interviews for a cohort from a CSV file")
+    parser.add_argument("csv_path", help="CSV with username, job_role, experience_level, interview_type[, skills, duration, email, password]")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"concurrent question generation requests (default {DEFAULT_WORKERS})")
+    parser.add_argument("--batch-size", type=int, default=QUESTION_BATCH_SIZE, help=f"interviews per model call (default {QUESTION_BATCH_SIZE})")
+    args = parser.parse_args(argv)
+
+    try:
+        report = provision_cohort(args.csv_path, max_workers=args.workers, batch_size=args.batch_size)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"❌ Provisioning failed: {e}")
+        return 1
+
+    print(f"✅ Provisioned {report['interviews']} interviews with {report['questions']} questions")
+    print(f"   Create: {report['create_seconds']:.2f}s | Generate: {report['generate_seconds']:.2f}s | Total: {report['total_seconds']:.2f}s")
+    print(f"   Throughput: {report['interviews_per_second']:.1f} interviews/s")
+    if report['failed_batches']:
+        print(f"⚠️ {report['failed_batches']} question batches failed; those interviews have no questions yet")
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
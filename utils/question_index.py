@@ -0,0 +1,264 @@
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from utils.database import get_question_vectors, get_unindexed_interview_questions, add_question_vectors
+
+# Optional local sentence embedding model; the hashed TF-IDF encoder is used when
+# sentence-transformers is not installed or the model cannot be loaded
+QUESTION_EMBEDDING_MODEL = os.getenv("QUESTION_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Cosine similarity at or above which two questions count as the same question
+EMBEDDING_DUPLICATE_THRESHOLD = 0.85
+TFIDF_DUPLICATE_THRESHOLD = 0.45
+
+# Users whose index is kept in memory; least recently used indexes are dropped first
+INDEX_CACHE_MAX_USERS = 256
+
+_TOKEN = re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can could did do does for from had has have how i if in into is it its "
+    "me my of on or our so that the their them then there these this those to us was we were what "
+    "when where which who why will with would you your".split()
+)
+
+class HashedTfidfEncoder:
+    """Feature-hashed word, bigram and character trigram counts with IDF applied at query time
+
+    Vectors are stored unweighted, so adding a question only updates document
+    frequencies and never requires re-encoding the questions already indexed.
+    """
+
+    name = "tfidf-hash-4096"
+    dimensions = 4096
+    threshold = TFIDF_DUPLICATE_THRESHOLD
+    uses_idf = True
+
+    def _features(self, text):
+        """Hashed feature counts for one question"""
+        words = [word.rstrip('s') if len(word) > 3 else word for word in _TOKEN.findall(text.lower())]
+        content = [word for word in words if word not in _STOPWORDS]
+
+        features = Counter(f"w:{word}" for word in content)
+        features.update(f"b:{first} {second}" for first, second in zip(content, content[1:]))
+        for word in content:
+            padded = f" {word} "
+            features.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+
+        counts = Counter()
+        for feature, count in features.items():
+            counts[zlib.crc32(feature.encode()) % self.dimensions] += count
+        return counts
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Sublinear term frequencies, one row per text"""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for index, count in self._features(text).items():
+                matrix[row, index] = 1.0 + math.log(count)
+        return matrix
+
+    def to_blob(self, vector: np.ndarray) -> bytes:
+        """Sparse storage: non-zero positions followed by their values"""
+        positions = np.flatnonzero(vector).astype(np.uint16)
+        return positions.tobytes() + vector[positions].astype(np.float32).tobytes()
+
+    def from_blob(self, blob: bytes) -> np.ndarray:
+        """Inverse of to_blob"""
+        count = len(blob) // 6
+        positions = np.frombuffer(blob[:count * 2], dtype=np.uint16)
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        vector[positions] = np.frombuffer(blob[count * 2:], dtype=np.float32)
+        return vector
+
+class SentenceEmbeddingEncoder:
+    """Normalized sentence embeddings from a local sentence-transformers model"""
+
+    threshold = EMBEDDING_DUPLICATE_THRESHOLD
+    uses_idf = False
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.name = f"st:{model_name}"
+        self.dimensions = self._model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Unit-length embeddings, one row per text"""
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    def to_blob(self, vector: np.ndarray) -> bytes:
+        return vector.astype(np.float32).tobytes()
+
+    def from_blob(self, blob: bytes) -> np.ndarray:
+        return np.frombuffer(blob, dtype=np.float32).copy()
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def get_encoder():
+    """The embedding model when available, otherwise the hashed TF-IDF encoder; loaded once"""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            try:
+                _encoder = SentenceEmbeddingEncoder(QUESTION_EMBEDDING_MODEL)
+            except Exception as e:
+                if not isinstance(e, ImportError):
+                    print(f"Embedding model unavailable, using TF-IDF question index: {e}")
+                _encoder = HashedTfidfEncoder()
+        return _encoder
+
+class QuestionIndex:
+    """In-memory exact nearest-neighbour index over one user's past questions"""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.questions = []
+        self._matrix = np.zeros((16, encoder.dimensions), dtype=np.float32)
+        self._document_frequency = np.zeros(encoder.dimensions, dtype=np.float32)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.questions)
+
+    def add(self, vectors: np.ndarray, questions: List[str]):
+        """Append encoded questions, growing the matrix geometrically"""
+        size = len(self.questions)
+        needed = size + len(questions)
+        if needed > len(self._matrix):
+            grown = np.zeros((max(needed, 2 * len(self._matrix)), self.encoder.dimensions), dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+        self._matrix[size:needed] = vectors
+        self._document_frequency += (vectors > 0).sum(axis=0)
+        self.questions.extend(questions)
+
+    def idf(self, extra: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Smoothed IDF over the indexed questions plus any extra (candidate) vectors"""
+        if not self.encoder.uses_idf:
+            return None
+        frequency = self._document_frequency
+        documents = len(self.questions)
+        if extra is not None:
+            frequency = frequency + (extra > 0).sum(axis=0)
+            documents += len(extra)
+        return np.log((1.0 + documents) / (1.0 + frequency)).astype(np.float32) + 1.0
+
+    def max_similarity(self, vectors: np.ndarray, idf: Optional[np.ndarray]) -> np.ndarray:
+        """Highest cosine similarity of each row of vectors against the indexed questions"""
+        if not self.questions or not len(vectors):
+            return np.zeros(len(vectors), dtype=np.float32)
+        return _cosine(vectors, self._matrix[:len(self.questions)], idf).max(axis=1)
+
+def _cosine(left: np.ndarray, right: np.ndarray, idf: Optional[np.ndarray]) -> np.ndarray:
+    """Pairwise cosine similarities, with IDF weights applied to both sides when given"""
+    if idf is None:
+        return left @ right.T
+    squared = idf * idf
+    dots = (left * squared) @ right.T
+    left_norms = np.sqrt((left * left) @ squared)
+    right_norms = np.sqrt((right * right) @ squared)
+    return dots / np.maximum(np.outer(left_norms, right_norms), 1e-12)
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def _sync_index(user_id, index: QuestionIndex):
+    """Index questions of interviews created since the last sync and persist their vectors"""
+    encoder = index.encoder
+    unindexed = get_unindexed_interview_questions(user_id, encoder.name)
+    if not unindexed:
+        return
+
+    rows = [(interview_id, question) for interview_id, questions in unindexed.items() for question in questions]
+    vectors = encoder.encode([question for _, question in rows])
+    add_question_vectors(user_id, encoder.name, [
+        (interview_id, question, encoder.to_blob(vector))
+        for (interview_id, question), vector in zip(rows, vectors)
+    ])
+    index.add(vectors, [question for _, question in rows])
+
+def get_question_index(user_id) -> QuestionIndex:
+    """A user's question index, loaded from its stored vectors and brought up to date"""
+    encoder = get_encoder()
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is None or index.encoder is not encoder:
+            index = QuestionIndex(encoder)
+            _indexes[user_id] = index
+            stored = get_question_vectors(user_id, encoder.name)
+            if stored:
+                index.add(
+                    np.stack([encoder.from_blob(vector) for _, _, vector in stored]),
+                    [question for _, question, _ in stored]
+                )
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > INDEX_CACHE_MAX_USERS:
+            _indexes.popitem(last=False)
+
+    with index.lock:
+        _sync_index(user_id, index)
+    return index
+
+def select_distinct_questions(user_id, candidates: List[str], num_questions: int, extra_candidates: Iterable[str] = ()) -> List[str]:
+    """Pick up to num_questions candidates that are not near-duplicates of each other or of the user's past questions
+
+    Candidates are taken in order, then extra_candidates (e.g. fallback questions) fill any gap.
+    When that is still not enough, questions the user has seen before are reused, but a set
+    never contains two near-duplicates of each other.
+    """
+    pool = []
+    seen = set()
+    for question in list(candidates) + list(extra_candidates):
+        key = question.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            pool.append(question.strip())
+    if not pool:
+        return []
+
+    encoder = get_encoder()
+    vectors = encoder.encode(pool)
+
+    if user_id is not None:
+        index = get_question_index(user_id)
+        with index.lock:
+            idf = index.idf(vectors)
+            past_similarity = index.max_similarity(vectors, idf)
+    else:
+        idf = QuestionIndex(encoder).idf(vectors)
+        past_similarity = np.zeros(len(pool), dtype=np.float32)
+    pairwise = _cosine(vectors, vectors, idf)
+
+    def is_repeat_within_set(position):
+        return any(pairwise[position, chosen] >= encoder.threshold for chosen in selected)
+
+    selected = []
+    reused = []
+    for position in range(len(pool)):
+        if len(selected) >= num_questions:
+            break
+        if is_repeat_within_set(position):
+            continue
+        if past_similarity[position] >= encoder.threshold:
+            reused.append(position)
+            continue
+        selected.append(position)
+
+    # Fall back to previously asked questions only when there are not enough new ones
+    for position in reused:
+        if len(selected) >= num_questions:
+            break
+        if not is_repeat_within_set(position):
+            selected.append(position)
+
+    return [pool[position] for position in sorted(selected)]
@@ -0,0 +1,64 @@
+import json
+from collections import OrderedDict
+
+import streamlit as st
+
+from utils.database import (
+    get_interview_version,
+    get_interview_mock,
+    get_interview_responses,
+    get_feedback_fields
+)
+
+# Interviews whose data each session keeps; least recently used ones are dropped first
+SESSION_CACHE_MAX_INTERVIEWS = 8
+
+def _session_cache() -> OrderedDict:
+    return st.session_state.setdefault('interview_cache', OrderedDict())
+
+def _read_through(interview_id, name, loader):
+    """Cached value for (interview, name) while the interview's write version is unchanged"""
+    cache = _session_cache()
+    version = get_interview_version(interview_id)
+
+    entry = cache.get(interview_id)
+    if entry is None or entry['version'] != version:
+        entry = {'version': version, 'values': {}}
+        cache[interview_id] = entry
+    cache.move_to_end(interview_id)
+    while len(cache) > SESSION_CACHE_MAX_INTERVIEWS:
+        cache.popitem(last=False)
+
+    if name not in entry['values']:
+        value = loader()
+        if value is None:
+            return None
+        entry['values'][name] = value
+    return entry['values'][name]
+
+def get_cached_interview(interview_id):
+    """Interview row and its parsed question list, or (None, []) when it does not exist
+
+    Reruns reuse the session's copy, with no SQL and no JSON parsing, until the questions
+    or answers of the interview are written again.
+    """
+    def load():
+        interview_data = get_interview_mock(interview_id)
+        if not interview_data:
+            return None
+        return interview_data, json.loads(interview_data.get('questions', '[]'))
+
+    cached = _read_through(interview_id, 'interview', load)
+    return cached if cached else (None, [])
+
+def get_cached_responses(interview_id):
+    """Stored answers of an interview, cached like get_cached_interview"""
+    return _read_through(interview_id, 'responses', lambda: get_interview_responses(interview_id))
+
+def get_cached_feedback_fields(interview_id, *fields):
+    """Selected feedback fields of the latest analysis, cached like get_cached_interview"""
+    return _read_through(interview_id, ('feedback',) + fields, lambda: get_feedback_fields(interview_id, *fields))
+
+def invalidate_interview(interview_id):
+    """Drop this session's cached copy of an interview"""
+    _session_cache().pop(interview_id, None)
@@ -0,0 +1,334 @@
+import re
+import difflib
+from functools import lru_cache
+from typing import List, Dict, Optional, Set, Tuple
+
+# Minimum overall confidence for a local extraction to be used without Gemini
+LOCAL_EXTRACTION_THRESHOLD = 0.75
+
+# Fuzzy match cutoff (difflib ratio) for misspelled roles and technologies
+FUZZY_CUTOFF = 0.8
+
+# Fuzzy matches are guesses: their confidence stays below the threshold, so only exact
+# gazetteer matches can skip Gemini
+FUZZY_MAX_CONFIDENCE = 0.7
+
+# Confidence of an experience level when stated years and a seniority keyword disagree
+# ("senior data scientist with 3 years"); below the threshold, so Gemini decides
+CONFLICTING_LEVEL_CONFIDENCE = 0.5
+
+# Bare role words that only say "software" when nothing qualifies them: "go developer" or
+# "salesforce developer" may mean something more specific, so a qualified match is a guess
+GENERIC_ROLE_ALIASES = {"developer", "programmer"}
+GENERIC_ROLE_CONFIDENCE = 0.6
+
+# Canonical job role -> aliases (all lowercase)
+JOB_ROLES = {
+    "Software Engineer": ["software engineer", "software developer", "swe", "sde", "programmer", "developer"],
+    "Frontend Developer": ["frontend developer", "front end developer", "frontend engineer", "front-end developer", "ui developer", "frontend dev"],
+    "Backend Developer": ["backend developer", "back end developer", "backend engineer", "back-end developer", "backend dev"],
+    "Full Stack Developer": ["full stack developer", "fullstack developer", "full-stack developer", "full stack engineer", "full stack dev", "fullstack dev"],
+    "Mobile Developer": ["mobile developer", "android developer", "ios developer", "mobile engineer"],
+    "Data Scientist": ["data scientist"],
+    "Data Analyst": ["data analyst", "business analyst", "bi analyst", "analytics analyst"],
+    "Data Engineer": ["data engineer", "etl developer", "big data engineer"],
+    "Machine Learning Engineer": ["machine learning engineer", "ml engineer", "ai engineer", "mle"],
+    "DevOps Engineer": ["devops engineer", "devops", "site reliability engineer", "sre", "platform engineer"],
+    "Cloud Engineer": ["cloud engineer", "cloud architect", "solutions architect"],
+    "Security Engineer": ["security engineer", "security analyst", "cybersecurity analyst", "penetration tester"],
+    "QA Engineer": ["qa engineer", "test engineer", "quality assurance engineer", "sdet", "software tester", "qa tester"],
+    "Database Administrator": ["database administrator", "dba"],
+    "Systems Administrator": ["systems administrator", "system administrator", "sysadmin"],
+    "Network Engineer": ["network engineer", "network administrator"],
+    "Product Manager": ["product manager", "product owner"],
+    "Project Manager": ["project manager", "program manager", "scrum master"],
+    "Engineering Manager": ["engineering manager", "software engineering manager", "tech lead", "team lead"],
+    "UX Designer": ["ux designer", "ui designer", "ui/ux designer", "product designer", "ux researcher"],
+    "Marketing Manager": ["marketing manager", "digital marketer", "marketing specialist"],
+    "Sales Representative": ["sales representative", "account executive", "sales manager"],
+    "Financial Analyst": ["financial analyst", "finance analyst"],
+    "Consultant": ["consultant", "management consultant"],
+    "Technical Writer": ["technical writer"],
+}
+
+# Canonical technology/skill -> aliases (all lowercase)
+SKILLS = {
+    "Python": ["python", "py"],
+    "Java": ["java"],
+    "JavaScript": ["javascript", "js", "ecmascript"],
+    "TypeScript": ["typescript", "ts"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp", ".net", "dotnet"],
+    "Go": ["golang"],
+    "Rust": ["rust"],
+    "Ruby": ["ruby", "rails", "ruby on rails"],
+    "PHP": ["php", "laravel"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swift"],
+    "SQL": ["sql", "mysql", "postgresql", "postgres", "sqlite", "t-sql"],
+    "NoSQL": ["nosql", "mongodb", "mongo", "cassandra", "dynamodb"],
+    "Redis": ["redis"],
+    "Kafka": ["kafka"],
+    "Spark": ["spark", "pyspark"],
+    "Hadoop": ["hadoop"],
+    "Airflow": ["airflow"],
+    "React": ["react", "reactjs", "react.js"],
+    "Angular": ["angular"],
+    "Vue": ["vue", "vuejs", "vue.js"],
+    "Node.js": ["nodejs", "node.js", "express.js", "expressjs"],
+    "Django": ["django"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "Spring": ["spring", "spring boot"],
+    "HTML/CSS": ["html", "css", "html/css"],
+    "REST APIs": ["rest api", "rest apis", "restful", "api design"],
+    "GraphQL": ["graphql"],
+    "AWS": ["aws", "amazon web services"],
+    "Azure": ["azure"],
+    "GCP": ["gcp", "google cloud"],
+    "Docker": ["docker", "containers"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "Terraform": ["terraform"],
+    "CI/CD": ["ci/cd", "cicd", "jenkins", "github actions"],
+    "Linux": ["linux", "unix", "bash"],
+    "Git": ["git"],
+    "Machine Learning": ["machine learning", "ml"],
+    "Deep Learning": ["deep learning", "neural networks"],
+    "NLP": ["nlp", "natural language processing"],
+    "Computer Vision": ["computer vision"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch", "torch"],
+    "Pandas": ["pandas"],
+    "Statistics": ["statistics", "stats"],
+    "Excel": ["excel", "spreadsheets"],
+    "Tableau": ["tableau"],
+    "Power BI": ["power bi", "powerbi"],
+    "Data Structures": ["data structures", "algorithms", "dsa"],
+    "System Design": ["system design", "distributed systems", "architecture"],
+    "Microservices": ["microservices"],
+    "Agile": ["agile", "scrum", "kanban"],
+    "Leadership": ["leadership", "mentoring", "people management"],
+    "Communication": ["communication", "presentation"],
+    "Project Management": ["project management", "stakeholder management"],
+    "Figma": ["figma"],
+}
+
+# Canonical experience level -> keyword aliases (all lowercase)
+EXPERIENCE_LEVELS = {
+    "Entry Level": ["entry", "entry level", "junior", "jr", "graduate", "grad", "fresher", "intern", "internship", "beginner", "new grad"],
+    "Mid Level": ["mid", "mid level", "mid-level", "intermediate", "associate"],
+    "Senior Level": ["senior", "sr", "experienced", "expert"],
+    "Lead/Principal": ["lead engineer", "lead developer", "principal", "staff engineer"],
+}
+
+# Canonical interview type -> keyword aliases (all lowercase)
+INTERVIEW_TYPES = {
+    "Technical": ["technical", "coding", "system design round", "whiteboard"],
+    "Behavioral": ["behavioral", "behavioural", "hr", "soft skills", "culture fit", "star method"],
+    "Case Study": ["case study", "case studies", "case interview"],
+    "Mixed": ["mixed", "both", "combination", "technical and behavioral", "all round"],
+}
+
+_YEARS_PATTERN = re.compile(r"(\d{1,2})\s*\+?\s*(?:years?|yrs?)")
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#./-]*")
+_MAX_NGRAM = 4
+
+def _build_alias_index(gazetteer: Dict[str, List[str]]) -> Dict[str, str]:
+    """Map every alias (and the canonical name itself) to its canonical value"""
+    index = {}
+    for canonical, aliases in gazetteer.items():
+        # Two-letter canonical names such as "Go" are too ambiguous to match on their own
+        if len(canonical) > 2:
+            index[canonical.lower()] = canonical
+        for alias in aliases:
+            index[alias] = canonical
+    return index
+
+_ROLE_INDEX = _build_alias_index(JOB_ROLES)
+_SKILL_INDEX = _build_alias_index(SKILLS)
+_LEVEL_INDEX = _build_alias_index(EXPERIENCE_LEVELS)
+_TYPE_INDEX = _build_alias_index(INTERVIEW_TYPES)
+
+# Words that may sit between an article and a role without qualifying it ("I'm a developer")
+_NON_QUALIFIERS = {"a", "an", "the", "as", "am", "im", "i'm", "i", "is", "be", "my", "for", "to", "and", "work", "working"}
+
+# Skills too short to match alone ("Go") count when they qualify a role word ("go developer")
+_SHORT_SKILLS = {canonical.lower(): canonical for canonical in SKILLS if len(canonical) <= 2}
+_ROLE_WORDS = {"developer", "developers", "dev", "engineer", "engineers", "programmer", "programmers"}
+
+# Only aliases long enough to be misspelled meaningfully take part in fuzzy matching
+_FUZZY_ROLE_ALIASES = [alias for alias in _ROLE_INDEX if len(alias) >= 6]
+_FUZZY_SKILL_ALIASES = [alias for alias in _SKILL_INDEX if len(alias) >= 5]
+
+def _ngrams(tokens: List[str]) -> List[Tuple[int, int, str]]:
+    """All (start, end, phrase) n-grams, longest first"""
+    grams = []
+    for size in range(min(_MAX_NGRAM, len(tokens)), 0, -1):
+        for start in range(len(tokens) - size + 1):
+            grams.append((start, start + size, " ".join(tokens[start:start + size])))
+    return grams
+
+def _match_gazetteer(tokens: List[str], index: Dict[str, str]) -> List[Tuple[str, int, int]]:
+    """Exact alias matches as (canonical, start, end), non-overlapping, longest first"""
+    matches = []
+    taken = set()
+    for start, end, phrase in _ngrams(tokens):
+        if phrase in index and not taken.intersection(range(start, end)):
+            matches.append((index[phrase], start, end))
+            taken.update(range(start, end))
+    return matches
+
+@lru_cache(maxsize=4096)
+def _fuzzy_lookup(phrase: str, kind: str) -> Tuple[Optional[str], float]:
+    """Closest alias for a phrase by difflib ratio, cached per phrase"""
+    if kind == "role":
+        aliases, index = _FUZZY_ROLE_ALIASES, _ROLE_INDEX
+    else:
+        aliases, index = _FUZZY_SKILL_ALIASES, _SKILL_INDEX
+    close = difflib.get_close_matches(phrase, aliases, n=1, cutoff=FUZZY_CUTOFF)
+    if not close:
+        return None, 0.0
+    ratio = difflib.SequenceMatcher(None, phrase, close[0]).ratio()
+    return index[close[0]], min(ratio, FUZZY_MAX_CONFIDENCE)
+
+def _level_for_years(count: int) -> str:
+    """Experience level for a number of years of experience"""
+    if count <= 2:
+        return "Entry Level"
+    if count <= 5:
+        return "Mid Level"
+    if count <= 10:
+        return "Senior Level"
+    return "Lead/Principal"
+
+def _extract_experience_level(text: str, tokens: List[str]) -> Tuple[Optional[str], float]:
+    """Experience level from explicit years of experience or seniority keywords
+    
+    Years win over keywords, but when they disagree the confidence drops below the threshold.
+    """
+    years = _YEARS_PATTERN.search(text)
+    keywords = {canonical for canonical, _, _ in _match_gazetteer(tokens, _LEVEL_INDEX)}
+    if years:
+        level = _level_for_years(int(years.group(1)))
+        if keywords and level not in keywords:
+            return level, CONFLICTING_LEVEL_CONFIDENCE
+        return level, 1.0
+
+    matches = _match_gazetteer(tokens, _LEVEL_INDEX)
+    if matches:
+        return matches[0][0], 0.9
+    return None, 0.0
+
+def _extract_interview_type(tokens: List[str]) -> Tuple[Optional[str], float]:
+    """Interview type from keywords; several distinct types imply a mixed interview"""
+    found = {canonical for canonical, _, _ in _match_gazetteer(tokens, _TYPE_INDEX)}
+    if not found:
+        return None, 0.0
+    if len(found) > 1 or "Mixed" in found:
+        return "Mixed", 0.9
+    return found.pop(), 0.9
+
+def _extract_job_role(tokens: List[str], keyword_positions: Set[int]) -> Tuple[Optional[str], float]:
+    """Job role from the role gazetteer, falling back to fuzzy matching
+    
+    A bare "developer" or "programmer" right after an unrecognized word is only a guess.
+    Fuzzy matching skips tokens already used as level or interview type keywords, so
+    "technical interview" is never read as a misspelled "technical writer".
+    """
+    matches = _match_gazetteer(tokens, _ROLE_INDEX)
+    if matches:
+        canonical, start, end = matches[0]
+        qualified = start > 0 and start - 1 not in keyword_positions and tokens[start - 1] not in _NON_QUALIFIERS
+        if " ".join(tokens[start:end]) in GENERIC_ROLE_ALIASES and qualified:
+            return canonical, GENERIC_ROLE_CONFIDENCE
+        return canonical, 1.0
+
+    best, best_score = None, 0.0
+    for start, end, phrase in _ngrams(tokens):
+        if len(phrase) < 6 or keyword_positions.intersection(range(start, end)):
+            continue
+        canonical, score = _fuzzy_lookup(phrase, "role")
+        if canonical and score > best_score:
+            best, best_score = canonical, score
+    return best, best_score
+
+def _extract_skills(tokens: List[str]) -> Tuple[List[str], float]:
+    """Skills from the technology gazetteer plus fuzzy matches for misspellings"""
+    skills = []
+    scores = []
+    matched_positions = set()
+    for canonical, start, end in _match_gazetteer(tokens, _SKILL_INDEX):
+        matched_positions.update(range(start, end))
+        if canonical not in skills:
+            skills.append(canonical)
+            scores.append(1.0)
+
+    for position, token in enumerate(tokens):
+        canonical = _SHORT_SKILLS.get(token)
+        if canonical and position + 1 < len(tokens) and tokens[position + 1] in _ROLE_WORDS:
+            matched_positions.add(position)
+            if canonical not in skills:
+                skills.append(canonical)
+                scores.append(1.0)
+
+    for position, token in enumerate(tokens):
+        if position in matched_positions or len(token) < 5:
+            continue
+        canonical, score = _fuzzy_lookup(token, "skill")
+        if canonical and canonical not in skills:
+            skills.append(canonical)
+            scores.append(score)
+
+    if not skills:
+        return [], 0.0
+    return skills, sum(scores) / len(scores)
+
+def extract_setup_slots(user_input: str) -> Dict:
+    """Extract job_role, experience_level, interview_type and skills locally with a confidence score"""
+    text = (user_input or "").lower()
+    tokens = [token.rstrip("./-") for token in _TOKEN_PATTERN.findall(text)]
+
+    keyword_positions = {
+        position
+        for index in (_LEVEL_INDEX, _TYPE_INDEX)
+        for _, start, end in _match_gazetteer(tokens, index)
+        for position in range(start, end)
+    }
+
+    job_role, role_conf = _extract_job_role(tokens, keyword_positions)
+    experience_level, level_conf = _extract_experience_level(text, tokens)
+    interview_type, type_conf = _extract_interview_type(tokens)
+    skills, skills_conf = _extract_skills(tokens)
+
+    slot_confidence = {}
+    if job_role:
+        slot_confidence["job_role"] = role_conf
+    if experience_level:
+        slot_confidence["experience_level"] = level_conf
+    if interview_type:
+        slot_confidence["interview_type"] = type_conf
+    if skills:
+        slot_confidence["skills"] = skills_conf
+
+    # Overall confidence is the weakest slot we extracted; nothing extracted means no confidence
+    confidence = min(slot_confidence.values()) if slot_confidence else 0.0
+
+    return {
+        "extracted_info": {
+            "job_role": job_role,
+            "experience_level": experience_level,
+            "interview_type": interview_type,
+            "skills": ", ".join(skills) if skills else None,
+        },
+        "slot_confidence": slot_confidence,
+        "confidence": confidence,
+    }
+
+def merge_extracted_info(*extractions: Dict) -> Dict:
+    """Merge extracted_info dicts, later non-empty values winning"""
+    merged = {"job_role": None, "experience_level": None, "interview_type": None, "skills": None}
+    for info in extractions:
+        for slot, value in (info or {}).items():
+            if slot in merged and value:
+                merged[slot] = value
+    return merged
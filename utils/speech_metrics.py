@@ -0,0 +1,175 @@
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Energy VAD: 30 ms frames; speech is anything VAD_MARGIN_DB above the recording's noise floor,
+# and always anything louder than VAD_SPEECH_DB, so answers with little silence (where the
+# quietest frames are speech too) are still detected
+VAD_FRAME_MS = 30
+VAD_MARGIN_DB = 12.0
+VAD_MIN_DB = -55.0
+VAD_SPEECH_DB = -40.0
+
+# Silences shorter than this are gaps between words, not pauses
+MIN_PAUSE_SECONDS = 0.3
+LONG_PAUSE_SECONDS = 2.0
+
+# Upper edges of the pause distribution buckets, in seconds
+PAUSE_BUCKETS = [(1.0, '0.3-1s'), (LONG_PAUSE_SECONDS, '1-2s'), (float('inf'), '2s+')]
+
+# Comfortable conversational pace for interview answers
+TARGET_WPM_RANGE = (120, 160)
+
+_WORD = re.compile(r"[A-Za-z0-9']+")
+_FILLERS = re.compile(
+    r"\b(?:u+m+|u+h+|e+r+m*|a+h+|h+m+|you know|i mean|kind of|sort of|basically|literally)\b",
+    re.IGNORECASE
+)
+
+def audio_to_array(audio):
+    """Mono float32 samples in [-1, 1] and the sample rate of a pydub AudioSegment"""
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[audio.sample_width]
+    samples = np.frombuffer(audio.raw_data, dtype=dtype).astype(np.float32)
+    if audio.sample_width == 1:
+        samples -= 128.0
+    samples /= float(2 ** (8 * audio.sample_width - 1))
+    if audio.channels > 1:
+        samples = samples.reshape(-1, audio.channels).mean(axis=1)
+    return samples, audio.frame_rate
+
+def detect_speech_frames(samples: np.ndarray, frame_rate: int) -> np.ndarray:
+    """Boolean speech flag per VAD_FRAME_MS frame, from frame energy against an adaptive noise floor"""
+    frame_length = max(1, int(frame_rate * VAD_FRAME_MS / 1000))
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    threshold = min(max(np.percentile(energy_db, 10) + VAD_MARGIN_DB, VAD_MIN_DB), VAD_SPEECH_DB)
+    return energy_db > threshold
+
+def _speech_runs(speech: np.ndarray):
+    """Start and end frame (exclusive) of every run of speech frames"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    return edges[0::2], edges[1::2]
+
+def analyze_transcript(transcript: str) -> Dict:
+    """Word and filler-word counts of an answer's text"""
+    word_count = len(_WORD.findall(transcript or ""))
+    filler_count = len(_FILLERS.findall(transcript or ""))
+    return {
+        'word_count': word_count,
+        'filler_count': filler_count,
+        'fillers_per_100_words': round(100.0 * filler_count / word_count, 1) if word_count else 0.0
+    }
+
+def analyze_answer_audio(audio, transcript: str) -> Dict:
+    """Pace, pause and filler metrics for one recorded answer
+
+    Pace is measured over the speaking span (first to last speech frame), so silence
+    before and after the answer does not lower it.
+    """
+    metrics = analyze_transcript(transcript)
+    samples, frame_rate = audio_to_array(audio)
+    speech = detect_speech_frames(samples, frame_rate)
+    frame_seconds = VAD_FRAME_MS / 1000.0
+
+    metrics['duration_seconds'] = round(len(samples) / frame_rate, 2) if frame_rate else 0.0
+    starts, ends = _speech_runs(speech)
+    if not len(starts):
+        metrics.update({
+            'speaking_seconds': 0.0, 'words_per_minute': 0.0, 'pause_count': 0,
+            'mean_pause_seconds': 0.0, 'longest_pause_seconds': 0.0, 'long_pause_count': 0,
+            'pause_distribution': {label: 0 for _, label in PAUSE_BUCKETS}
+        })
+        return metrics
+
+    gaps = (starts[1:] - ends[:-1]) * frame_seconds
+    pauses = gaps[gaps >= MIN_PAUSE_SECONDS]
+    speaking_seconds = float(ends[-1] - starts[0]) * frame_seconds
+    bucket_index = np.searchsorted([edge for edge, _ in PAUSE_BUCKETS], pauses, side='right')
+    bucket_counts = np.bincount(bucket_index, minlength=len(PAUSE_BUCKETS))
+
+    metrics.update({
+        'speaking_seconds': round(speaking_seconds, 2),
+        'words_per_minute': round(60.0 * metrics['word_count'] / speaking_seconds, 1) if speaking_seconds else 0.0,
+        'pause_count': int(len(pauses)),
+        'mean_pause_seconds': round(float(pauses.mean()), 2) if len(pauses) else 0.0,
+        'longest_pause_seconds': round(float(pauses.max()), 2) if len(pauses) else 0.0,
+        'long_pause_count': int(np.count_nonzero(pauses >= LONG_PAUSE_SECONDS)),
+        'pause_distribution': {label: int(count) for (_, label), count in zip(PAUSE_BUCKETS, bucket_counts)}
+    })
+    return metrics
+
+def summarize_speech_metrics(responses: List[Dict]) -> Optional[Dict]:
+    """Interview-level delivery metrics from per-answer metrics
+
+    Answers without stored metrics contribute their word and filler counts from the text.
+    Pace and pauses only cover recorded answers with detected speech.
+    """
+    if not responses:
+        return None
+
+    word_count = filler_count = 0
+    timed_words = 0
+    speaking_seconds = 0.0
+    pause_count = long_pause_count = 0
+    pause_total = longest_pause = 0.0
+    distribution = {label: 0 for _, label in PAUSE_BUCKETS}
+    recorded = 0
+
+    for response in responses:
+        metrics = response.get('speech_metrics') or analyze_transcript(response.get('response') or response.get('answer'))
+        word_count += metrics['word_count']
+        filler_count += metrics['filler_count']
+        if 'speaking_seconds' not in metrics:
+            continue
+
+        recorded += 1
+        if not metrics['speaking_seconds']:
+            # No speech detected: its words would inflate the pace
+            continue
+        timed_words += metrics['word_count']
+        speaking_seconds += metrics['speaking_seconds']
+        pause_count += metrics['pause_count']
+        long_pause_count += metrics['long_pause_count']
+        pause_total += metrics['mean_pause_seconds'] * metrics['pause_count']
+        longest_pause = max(longest_pause, metrics['longest_pause_seconds'])
+        for label, count in metrics['pause_distribution'].items():
+            distribution[label] = distribution.get(label, 0) + count
+
+    summary = {
+        'answers': len(responses),
+        'recorded_answers': recorded,
+        'word_count': word_count,
+        'filler_count': filler_count,
+        'fillers_per_100_words': round(100.0 * filler_count / word_count, 1) if word_count else 0.0
+    }
+    if recorded and speaking_seconds:
+        summary.update({
+            'words_per_minute': round(60.0 * timed_words / speaking_seconds, 1),
+            'pauses_per_minute': round(60.0 * pause_count / speaking_seconds, 1),
+            'mean_pause_seconds': round(pause_total / pause_count, 2) if pause_count else 0.0,
+            'longest_pause_seconds': longest_pause,
+            'long_pause_count': long_pause_count,
+            'pause_distribution': distribution
+        })
+    return summary
+
+def format_speech_metrics(summary: Optional[Dict]) -> str:
+    """Plain-text summary of delivery metrics for the analysis prompt"""
+    if not summary:
+        return ""
+
+    lines = [f"- Filler words: {summary['filler_count']} ({summary['fillers_per_100_words']} per 100 words)"]
+    if 'words_per_minute' in summary:
+        low, high = TARGET_WPM_RANGE
+        lines.insert(0, f"- Speaking pace: {summary['words_per_minute']} words per minute (comfortable range {low}-{high})")
+        lines.append(
+            f"- Pauses: {summary['pauses_per_minute']} per minute, mean {summary['mean_pause_seconds']}s, "
+            f"longest {summary['longest_pause_seconds']}s, {summary['long_pause_count']} of {LONG_PAUSE_SECONDS:g}s or more"
+        )
+        lines.append(f"- Measured from audio for {summary['recorded_answers']} of {summary['answers']} answers")
+    return "\n".join(lines)
@@ -0,0 +1,343 @@
+"""Text-to-speech engines behind one interface, with caching and per-engine latency stats.
+
+The engine comes from TTS_ENGINE: "piper", "espeak" or "gtts", or "auto" (the default) for the
+first available offline engine with gTTS as the last resort. If the selected engine fails, the
+remaining available engines are tried in order. An explicitly selected offline engine only
+falls back to other offline engines, so text never leaves the server, unless
+TTS_NETWORK_FALLBACK=1 also allows gTTS.
+
+Benchmark the installed engines:
+    python -m utils.tts "Tell me about a project you are proud of."
+"""
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from gtts import gTTS
+
+from utils.database import get_db_path
+
+TTS_ENGINE = os.getenv("TTS_ENGINE", "auto").lower()
+TTS_LANGUAGE = os.getenv("TTS_LANGUAGE", "en")
+TTS_NETWORK_FALLBACK = os.getenv("TTS_NETWORK_FALLBACK", "0").lower() in ("1", "true", "yes")
+
+ESPEAK_VOICE = os.getenv("ESPEAK_VOICE", "en-us")
+ESPEAK_WORDS_PER_MINUTE = int(os.getenv("ESPEAK_WORDS_PER_MINUTE", "165"))
+
+# Path to a Piper voice model (.onnx with its .onnx.json next to it)
+PIPER_MODEL = os.getenv("PIPER_MODEL")
+PIPER_BINARY = os.getenv("PIPER_BINARY", "piper")
+
+# Synthesized audio is cached on disk next to the database and in a small in-memory LRU
+TTS_CACHE_DIR = os.path.join(os.path.dirname(get_db_path()), 'tts_cache')
+TTS_MEMORY_CACHE_ENTRIES = 256
+
+# Recent synthesis latencies kept per engine for the stats
+LATENCY_WINDOW = 200
+
+SUBPROCESS_TIMEOUT = 30
+
+class TTSBackend(ABC):
+    """A speech engine: turns text into encoded audio bytes"""
+
+    name = None
+    offline = True
+
+    @classmethod
+    @abstractmethod
+    def is_available(cls) -> bool:
+        """Whether the engine and everything it needs are installed"""
+
+    @abstractmethod
+    def cache_key(self, text: str) -> str:
+        """Identity of an utterance for this engine and its voice settings"""
+
+    @abstractmethod
+    def synthesize(self, text: str) -> bytes:
+        """Encoded audio (MP3 or WAV; playback sniffs the format) for text; raises on failure"""
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS; needs network access"""
+
+    name = "gtts"
+    offline = False
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def cache_key(self, text):
+        return f"{self.name}:{TTS_LANGUAGE}:{text}"
+
+    def synthesize(self, text):
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=TTS_LANGUAGE, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng formant synthesis; robotic but fast and fully offline"""
+
+    name = "espeak"
+
+    @staticmethod
+    def _binary():
+        return shutil.which("espeak-ng") or shutil.which("espeak")
+
+    @classmethod
+    def is_available(cls):
+        return cls._binary() is not None
+
+    def cache_key(self, text):
+        return f"{self.name}:{ESPEAK_VOICE}:{ESPEAK_WORDS_PER_MINUTE}:{text}"
+
+    def synthesize(self, text):
+        result = subprocess.run(
+            [self._binary(), "--stdout", "-v", ESPEAK_VOICE, "-s", str(ESPEAK_WORDS_PER_MINUTE), text],
+            capture_output=True, timeout=SUBPROCESS_TIMEOUT, check=True
+        )
+        return result.stdout
+
+class PiperBackend(TTSBackend):
+    """Piper neural TTS on the CPU; natural voices, fully offline
+
+    Uses the piper-tts Python package when installed, so the voice model is loaded once,
+    otherwise the piper command line program.
+    """
+
+    name = "piper"
+
+    _voice = None
+    _voice_lock = threading.Lock()
+
+    @classmethod
+    def is_available(cls):
+        if not PIPER_MODEL or not os.path.exists(PIPER_MODEL):
+            return False
+        try:
+            import piper  # noqa: F401
+            return True
+        except ImportError:
+            return shutil.which(PIPER_BINARY) is not None
+
+    def cache_key(self, text):
+        return f"{self.name}:{os.path.basename(PIPER_MODEL)}:{text}"
+
+    @classmethod
+    def _load_voice(cls):
+        """Loaded PiperVoice, or None when only the command line program is installed"""
+        with cls._voice_lock:
+            if cls._voice is None:
+                try:
+                    from piper.voice import PiperVoice
+                except ImportError:
+                    return None
+                cls._voice = PiperVoice.load(PIPER_MODEL)
+            return cls._voice
+
+    def synthesize(self, text):
+        import wave
+
+        voice = self._load_voice()
+        if voice is not None:
+            buffer = io.BytesIO()
+            with wave.open(buffer, "wb") as wav_file:
+                # piper-tts 1.3 renamed synthesize() to synthesize_wav()
+                synthesize_wav = getattr(voice, "synthesize_wav", None) or voice.synthesize
+                synthesize_wav(text, wav_file)
+            return buffer.getvalue()
+
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "speech.wav")
+            subprocess.run(
+                [PIPER_BINARY, "--model", PIPER_MODEL, "--output_file", output_path],
+                input=text.encode(), capture_output=True, timeout=SUBPROCESS_TIMEOUT, check=True
+            )
+            with open(output_path, "rb") as wav_file:
+                return wav_file.read()
+
+# Preference order for TTS_ENGINE=auto: offline engines first
+BACKENDS = OrderedDict((backend.name, backend) for backend in (PiperBackend, EspeakBackend, GTTSBackend))
+
+_engines = None
+_engines_lock = threading.Lock()
+_memory_cache = OrderedDict()
+_memory_cache_lock = threading.Lock()
+_latencies = {}
+_latency_lock = threading.Lock()
+
+def get_tts_engines() -> List[TTSBackend]:
+    """Available engines in the order they are tried, the configured one first
+    
+    Network engines are only fallbacks under TTS_ENGINE=auto or with TTS_NETWORK_FALLBACK.
+    """
+    global _engines
+    with _engines_lock:
+        if _engines is None:
+            names = list(BACKENDS)
+            allow_network = True
+            if TTS_ENGINE in BACKENDS:
+                names.remove(TTS_ENGINE)
+                names.insert(0, TTS_ENGINE)
+                allow_network = TTS_NETWORK_FALLBACK or not BACKENDS[TTS_ENGINE].offline
+                if not BACKENDS[TTS_ENGINE].is_available():
+                    print(f"❌ TTS_ENGINE '{TTS_ENGINE}' is not available"
+                          + ("" if allow_network else "; only offline engines are tried (TTS_NETWORK_FALLBACK=1 allows gTTS)"))
+            elif TTS_ENGINE != "auto":
+                print(f"Unknown TTS_ENGINE '{TTS_ENGINE}', using auto")
+            _engines = [
+                BACKENDS[name]() for name in names
+                if (BACKENDS[name].offline or allow_network or name == TTS_ENGINE) and BACKENDS[name].is_available()
+            ]
+        return list(_engines)
+
+def _cache_path(key: str) -> str:
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, digest[:2], digest)
+
+def _read_cache(key: str):
+    """Cached audio for a key from memory, then disk"""
+    with _memory_cache_lock:
+        audio = _memory_cache.get(key)
+        if audio is not None:
+            _memory_cache.move_to_end(key)
+            return audio
+
+    try:
+        with open(_cache_path(key), "rb") as cache_file:
+            audio = cache_file.read()
+    except OSError:
+        return None
+    _remember(key, audio)
+    return audio
+
+def _remember(key: str, audio: bytes):
+    with _memory_cache_lock:
+        _memory_cache[key] = audio
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > TTS_MEMORY_CACHE_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+def _write_cache(key: str, audio: bytes):
+    _remember(key, audio)
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partial, "wb") as cache_file:
+            cache_file.write(audio)
+        os.replace(partial, path)
+    except OSError as e:
+        print(f"Could not cache synthesized speech: {e}")
+
+def record_latency(engine: str, seconds: float):
+    """Add an uncached synthesis time to the engine's stats (see get_tts_latency_stats)"""
+    with _latency_lock:
+        _latencies.setdefault(engine, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+def get_tts_latency_stats() -> Dict[str, Dict]:
+    """Per-engine synthesis latency over recent uncached requests: count, mean, p50, p95 (seconds)"""
+    with _latency_lock:
+        samples = {engine: sorted(values) for engine, values in _latencies.items() if values}
+    return {
+        engine: {
+            'count': len(values),
+            'mean': sum(values) / len(values),
+            'p50': values[len(values) // 2],
+            'p95': values[min(len(values) - 1, int(len(values) * 0.95))]
+        }
+        for engine, values in samples.items()
+    }
+
+def cached_speech(text: str) -> Optional[bytes]:
+    """Audio for text from the memory or disk cache of the first engine that has it, else None"""
+    for engine in get_tts_engines():
+        audio = _read_cache(engine.cache_key(text))
+        if audio is not None:
+            return audio
+    return None
+
+def synthesize_timed(text: str) -> Tuple[bytes, Optional[str], Optional[float]]:
+    """Audio for text with the engine that produced it and its synthesis seconds
+    
+    Engine and seconds are None for cache hits. Raises if every engine fails.
+    """
+    errors = []
+    for engine in get_tts_engines():
+        key = engine.cache_key(text)
+        audio = _read_cache(key)
+        if audio is not None:
+            return audio, None, None
+
+        started = time.perf_counter()
+        try:
+            audio = engine.synthesize(text)
+        except Exception as e:
+            errors.append(f"{engine.name}: {e}")
+            continue
+        seconds = time.perf_counter() - started
+
+        if audio:
+            _write_cache(key, audio)
+            return audio, engine.name, seconds
+        errors.append(f"{engine.name}: no audio produced")
+
+    raise RuntimeError("Text-to-speech failed (" + "; ".join(errors or ["no engine available"]) + ")")
+
+def synthesize(text: str) -> bytes:
+    """Audio for text from the cache or the first engine that succeeds; raises if every engine fails"""
+    audio, engine, seconds = synthesize_timed(text)
+    if engine is not None:
+        record_latency(engine, seconds)
+    return audio
+
+def benchmark_engines(text: str, repeats: int = 3) -> Dict[str, Dict]:
+    """Time every available engine on text, bypassing the cache; timings also go to get_tts_latency_stats"""
+    results = {}
+    for name, backend in BACKENDS.items():
+        if not backend.is_available():
+            continue
+        engine = backend()
+        timings = []
+        try:
+            for _ in range(repeats):
+                started = time.perf_counter()
+                audio = engine.synthesize(text)
+                timings.append(time.perf_counter() - started)
+                record_latency(name, timings[-1])
+        except Exception as e:
+            results[name] = {'error': str(e)}
+            continue
+        results[name] = {'best': min(timings), 'mean': sum(timings) / len(timings), 'bytes': len(audio)}
+    return results
+
+def main(argv=None):
+    """Command line entry point: benchmark the available engines"""
+    argv = sys.argv[1:] if argv is None else argv
+    text = " ".join(argv) or "Tell me about a project you are proud of and your role in it."
+    results = benchmark_engines(text)
+    if not results:
+        print("❌ No text-to-speech engine available")
+        return 1
+    stats = get_tts_latency_stats()
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"❌ {name}: {result['error']}")
+        else:
+            latency = stats[name]
+            print(
+                f"✅ {name}: best {result['best'] * 1000:.0f} ms, p50 {latency['p50'] * 1000:.0f} ms, "
+                f"p95 {latency['p95'] * 1000:.0f} ms over {latency['count']} runs, {result['bytes']} bytes"
+            )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())